@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量匹配：按目录配对美团订单与预订记录文件，并行匹配并导出
+
+两个目录下的文件按 (子目录, 年份, 月份) 配对，子目录通常对应门店，年月从文件名中识别
+（如"2025-08"、"20250801"、"8月预定"）。每对文件导出一个与界面"全部（按时间排列）"
+相同格式的Excel（或 --format 指定的CSV、Parquet、JSON Lines），另外生成一份汇总表。
+
+用法：
+    python batch_match.py 美团目录 预订目录 -o 输出目录 [-j 进程数] [--format parquet]
+    python launcher.py batch 美团目录 预订目录 -o 输出目录
+"""
+
+import argparse
+import re
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+import exporter
+import match_engine
+import matcher_core
+import parallel
+
+EXCEL_SUFFIXES = {'.xlsx', '.xls'}
+SUMMARY_FILENAME = '批量匹配汇总.xlsx'
+
+# 文件名中的年月：2025-08、2025年8月、20250801 等
+YEAR_MONTH_PATTERN = re.compile(r'(20\d{2})\s*[-_./年]?\s*(1[0-2]|0?[1-9])(?!\d)|(20\d{2})(0[1-9]|1[0-2])\d{2}')
+# 只有月份：8月预定
+MONTH_PATTERN = re.compile(r'(?<!\d)(1[0-2]|0?[1-9])\s*月')
+
+
+def period_of(filename):
+    """从文件名识别 (年, 月)，识别不到的部分为None"""
+    match = YEAR_MONTH_PATTERN.search(filename)
+    if match:
+        if match.group(1):
+            return int(match.group(1)), int(match.group(2))
+        return int(match.group(3)), int(match.group(4))
+    match = MONTH_PATTERN.search(filename)
+    if match:
+        return None, int(match.group(1))
+    return None, None
+
+
+def scan_workbooks(directory):
+    """列出目录（含子目录）下的Excel文件，返回 {(子目录, 年, 月): [路径]}"""
+    directory = Path(directory)
+    workbooks = defaultdict(list)
+    for path in sorted(directory.rglob('*')):
+        # 跳过Excel打开文件时生成的 ~$ 临时文件
+        if path.suffix.lower() not in EXCEL_SUFFIXES or path.name.startswith('~$'):
+            continue
+        year, month = period_of(path.stem)
+        workbooks[(str(path.parent.relative_to(directory)), year, month)].append(path)
+    return workbooks
+
+
+def pair_workbooks(meituan_dir, reservation_dir):
+    """配对两个目录下的文件，返回 (配对列表, 未配对的文件列表)
+
+    优先按 (子目录, 年, 月) 精确配对；一侧文件名没有年份时按 (子目录, 月) 配对，
+    子目录下两侧各只有一个识别不出年月的文件时直接配对。同一键下有多个文件、或一个键
+    同时对应另一侧多个键时无法确定，两侧均记为未配对。
+    """
+    meituan_books = scan_workbooks(meituan_dir)
+    reservation_books = scan_workbooks(reservation_dir)
+
+    # 先收集每个美团键的候选键：同键的精确配对优先，其余按 (子目录, 月) 在未被精确配对的键中查找
+    exact = {key for key in meituan_books if key in reservation_books}
+    candidates = {}
+    claims = defaultdict(list)
+    for key in meituan_books:
+        group, year, month = key
+        if key in exact:
+            candidates[key] = [key]
+        else:
+            candidates[key] = [
+                other for other in reservation_books
+                if other not in exact and month is not None
+                and other[0] == group and other[2] == month and (year is None or other[1] is None)
+            ]
+        for other in candidates[key]:
+            claims[other].append(key)
+
+    # 两侧都只有唯一候选、且各只有一个文件时才配对
+    pairs = []
+    unpaired = []
+    remaining = dict(reservation_books)
+    for key, meituan_paths in meituan_books.items():
+        options = candidates[key]
+        if len(options) == 1 and len(claims[options[0]]) == 1 \
+                and len(meituan_paths) == 1 and len(remaining[options[0]]) == 1:
+            pairs.append((key, meituan_paths[0], remaining.pop(options[0])[0]))
+        else:
+            unpaired.extend(meituan_paths)
+    for reservation_paths in remaining.values():
+        unpaired.extend(reservation_paths)
+    return pairs, unpaired
+
+
+def pair_label(key, meituan_path):
+    """配对的显示名称，如"门店A/2025年8月" """
+    group, year, month = key
+    if month is None:
+        period = meituan_path.stem
+    elif year is None:
+        period = f"{month}月"
+    else:
+        period = f"{year}年{month}月"
+    return period if group == '.' else f"{group}/{period}"
+
+
+def match_pair(label, meituan_path, reservation_path, output_path, match_workers=None,
+               assignment=match_engine.ASSIGN_ALL, tolerance=match_engine.DEFAULT_TIME_TOLERANCE,
+               file_format='xlsx'):
+    """匹配一对文件并导出，返回汇总行
+
+    match_workers 为单组文件内部的并行进程数，已在进程池中运行时传1。
+    """
+    summary = {
+        '名称': label,
+        '美团文件': str(meituan_path),
+        '预订文件': str(reservation_path),
+        '总记录': 0,
+        '已匹配': 0,
+        '未匹配': 0,
+        '匹配率': 0.0,
+        '导出文件': '',
+        '状态': '',
+    }
+
+    matcher = matcher_core.ReservationMatcher()
+    if matcher.load_meituan(meituan_path) is None:
+        summary['状态'] = '无法识别美团文件格式'
+        return summary
+    _, _, failed_sheets = matcher.load_reservation(reservation_path, max_workers=match_workers)
+    is_valid, message = matcher.validate_files()
+    if not is_valid:
+        summary['状态'] = message
+        return summary
+
+    success, message = matcher.match_data(
+        max_workers=match_workers, assignment=assignment, tolerance=tolerance
+    )
+    if not success:
+        summary['状态'] = message
+        return summary
+
+    merged_df = matcher.merged_df
+    matched = int((merged_df['匹配状态'] == '已匹配').sum()) if not merged_df.empty else 0
+    summary['总记录'] = len(merged_df)
+    summary['已匹配'] = matched
+    summary['未匹配'] = len(merged_df) - matched
+    summary['匹配率'] = round(matched / len(merged_df) * 100, 1) if len(merged_df) else 0.0
+
+    export_df, _ = matcher.prepare_export("全部（按时间排列）")
+    if export_df.empty:
+        summary['状态'] = '没有匹配成功的数据可导出'
+    else:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        exporter.write_results(export_df, output_path, file_format)
+        summary['导出文件'] = str(output_path)
+        summary['状态'] = '完成'
+    if failed_sheets:
+        summary['状态'] += f"（{len(failed_sheets)} 个工作表处理失败）"
+    return summary
+
+
+def run_batch(meituan_dir, reservation_dir, output_dir, max_workers=None, log=print,
+              assignment=match_engine.ASSIGN_ALL, tolerance=match_engine.DEFAULT_TIME_TOLERANCE,
+              file_format='xlsx'):
+    """批量匹配两个目录下配对的文件，返回汇总DataFrame"""
+    output_dir = Path(output_dir)
+    pairs, unpaired = pair_workbooks(meituan_dir, reservation_dir)
+    for path in unpaired:
+        log(f"⚠️ 未配对，已跳过: {path}")
+    if not pairs:
+        log("❌ 没有可配对的文件")
+        return pd.DataFrame()
+
+    tasks = []
+    for key, meituan_path, reservation_path in pairs:
+        label = pair_label(key, meituan_path)
+        # 导出文件按子目录（门店）分开存放
+        output_path = output_dir / key[0] / f"匹配结果_{label.rsplit('/', 1)[-1]}.{file_format}"
+        tasks.append((label, meituan_path, reservation_path, output_path))
+
+    workers = parallel.resolve_worker_count(max_workers, len(tasks))
+    log(f"🚀 共 {len(tasks)} 组文件，使用 {workers} 个进程")
+    # 文件间已并行时，单组文件内部的工作表解析和分区匹配串行进行，避免嵌套进程池
+    match_workers = 1 if workers > 1 else max_workers
+    tasks = [task + (match_workers, assignment, tolerance, file_format) for task in tasks]
+
+    summaries = []
+    if workers <= 1:
+        for task in tasks:
+            summaries.append(_run_task(task))
+            log(_progress_line(summaries[-1], len(summaries), len(tasks)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_run_task, task): task for task in tasks}
+            for future in as_completed(futures):
+                summaries.append(future.result())
+                log(_progress_line(summaries[-1], len(summaries), len(tasks)))
+
+    # 汇总按配对顺序排列
+    order = {task[0]: i for i, task in enumerate(tasks)}
+    summary_df = pd.DataFrame(sorted(summaries, key=lambda row: order[row['名称']]))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    summary_df.to_excel(output_dir / SUMMARY_FILENAME, sheet_name='汇总', index=False)
+    return summary_df
+
+
+def _run_task(task):
+    """工作进程入口：单组文件出错时记录到汇总中，不影响其他文件"""
+    label, meituan_path, reservation_path = task[:3]
+    started = time.perf_counter()
+    try:
+        summary = match_pair(*task)
+    except Exception as e:
+        summary = {
+            '名称': label,
+            '美团文件': str(meituan_path),
+            '预订文件': str(reservation_path),
+            '状态': f"处理失败: {e}",
+        }
+    summary['耗时(秒)'] = round(time.perf_counter() - started, 2)
+    return summary
+
+
+def _progress_line(summary, done, total):
+    return f"[{done}/{total}] {summary['名称']}: {summary['状态']}，已匹配 {summary.get('已匹配', 0)}/{summary.get('总记录', 0)}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量匹配美团订单与预订记录")
+    parser.add_argument('meituan_dir', help="美团订单文件目录")
+    parser.add_argument('reservation_dir', help="预订记录文件目录")
+    parser.add_argument('-o', '--output-dir', default='匹配结果', help="导出目录（默认：匹配结果）")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="并行进程数（默认：可用CPU核数）")
+    assignment_group = parser.add_mutually_exclusive_group()
+    assignment_group.add_argument('--nearest', action='store_true', help="按时间就近一对一分配订单")
+    assignment_group.add_argument('--optimal', action='store_true',
+                                  help="按匹配类型和时间差求一对一最优分配，解决同一订单被多条预订匹配的冲突")
+    parser.add_argument('--tolerance', type=int, default=None,
+                        help="一对一分配时的时间容差（分钟，默认：180）")
+    parser.add_argument('-f', '--format', dest='file_format', choices=list(exporter.FILE_FORMATS), default='xlsx',
+                        help="导出格式（默认：xlsx）；csv、parquet、jsonl 中支付合计为数值，供下游脚本读取")
+    args = parser.parse_args(argv)
+
+    for directory in (args.meituan_dir, args.reservation_dir):
+        if not Path(directory).is_dir():
+            parser.error(f"目录不存在: {directory}")
+
+    started = time.perf_counter()
+    assignment = match_engine.ASSIGN_ALL
+    if args.nearest:
+        assignment = match_engine.ASSIGN_NEAREST
+    elif args.optimal:
+        assignment = match_engine.ASSIGN_OPTIMAL
+    tolerance = match_engine.DEFAULT_TIME_TOLERANCE
+    if args.tolerance is not None:
+        tolerance = pd.Timedelta(minutes=args.tolerance)
+    summary_df = run_batch(
+        args.meituan_dir, args.reservation_dir, args.output_dir, args.workers,
+        assignment=assignment, tolerance=tolerance, file_format=args.file_format,
+    )
+    if summary_df.empty:
+        return 1
+
+    print(f"✅ 完成 {len(summary_df)} 组，用时 {time.perf_counter() - started:.1f} 秒，"
+          f"汇总: {Path(args.output_dir) / SUMMARY_FILENAME}")
+    failed = summary_df[~summary_df['状态'].astype(str).str.startswith('完成')]
+    return 1 if len(failed) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+进程内共享的数据集存储
+
+多个会话打开同一文件时，解析结果和匹配结果在进程内只保存一份：会话持有数据集的引用
+（DatasetRef），数据集只读，按引用计数管理。内存占用超过上限时按最近最少使用把数据集
+移出内存：已无会话引用的直接丢弃，仍被引用的先写入数据目录，再次访问时从磁盘读回。
+"""
+
+import atexit
+import os
+import shutil
+import threading
+import weakref
+from collections import OrderedDict
+
+import parse_cache
+
+# 按进程分目录，进程退出时删除，不影响同一数据目录下的其他进程
+DATASET_DIR = parse_cache.DATA_DIR / 'datasets' / str(os.getpid())
+# 内存中数据集的容量上限（MB）
+MEMORY_BUDGET = int(os.environ.get('MATCHER_DATASET_MEMORY_MB', 512)) * 1024 * 1024
+
+_lock = threading.RLock()
+# 数据集键 -> 数据集信息（DataFrame、占用字节数、引用计数、附加信息、是否已写入磁盘）
+_entries = {}
+# 在内存中的数据集键，按使用先后排列，最近使用的在末尾
+_resident = OrderedDict()
+_resident_bytes = 0
+
+
+class DatasetRef:
+    """会话对共享数据集的引用，不再使用（或被回收）时自动减少引用计数"""
+
+    def __init__(self, key, meta):
+        self.key = key
+        # 附加信息（如有效工作表数）始终保存在内存中
+        self.meta = meta
+        self._finalizer = weakref.finalize(self, release, key)
+
+    def get(self):
+        """读取数据集，返回的DataFrame为共享对象，不能原地修改"""
+        return get(self.key)
+
+    def release(self):
+        """释放引用，可重复调用"""
+        self._finalizer()
+
+
+def acquire(key, loader):
+    """获取数据集的引用，不在存储中时调用 loader() 加载
+
+    loader 返回 (DataFrame, 附加信息)，DataFrame为None时表示无法加载，返回None。
+    """
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            entry['refs'] += 1
+            return DatasetRef(key, entry['meta'])
+
+    # 加载可能较慢，不占用锁；并发加载同一数据集时使用先完成的结果
+    df, meta = loader()
+    if df is None:
+        return None
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            entry = {'frame': None, 'size': 0, 'refs': 0, 'meta': meta, 'spilled': False}
+            _entries[key] = entry
+            _make_resident(key, df)
+            _enforce_budget(keep=key)
+        entry['refs'] += 1
+        return DatasetRef(key, entry['meta'])
+
+
+def get(key):
+    """按键读取数据集，已移出内存的从磁盘读回"""
+    with _lock:
+        entry = _entries[key]
+        if entry['frame'] is not None:
+            _resident.move_to_end(key)
+            return entry['frame']
+        df = parse_cache.read_frame(_spill_path(key))
+        _make_resident(key, df)
+        _enforce_budget(keep=key)
+        return df
+
+
+def release(key):
+    """减少引用计数；无引用的数据集留在内存中供再次打开，超出上限时优先丢弃"""
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return
+        entry['refs'] -= 1
+        if entry['refs'] <= 0 and entry['frame'] is None:
+            _discard(key)
+
+
+def _spill_path(key):
+    return DATASET_DIR / f"{key}.parquet"
+
+
+def _make_resident(key, df):
+    global _resident_bytes
+    entry = _entries[key]
+    entry['frame'] = df
+    entry['size'] = int(df.memory_usage(deep=True).sum())
+    _resident[key] = None
+    _resident_bytes += entry['size']
+
+
+def _evict(key):
+    """把数据集移出内存，仍被引用且写入磁盘失败时保留在内存中，返回是否已移出"""
+    global _resident_bytes
+    entry = _entries[key]
+    if entry['refs'] > 0 and not entry['spilled']:
+        try:
+            parse_cache.write_files(entry['frame'], _spill_path(key))
+        except Exception:
+            return False
+        entry['spilled'] = True
+    _resident.pop(key)
+    _resident_bytes -= entry['size']
+    entry['frame'] = None
+    if entry['refs'] <= 0:
+        _discard(key)
+    return True
+
+
+def _discard(key):
+    entry = _entries.pop(key)
+    if entry['spilled']:
+        try:
+            _spill_path(key).unlink()
+        except OSError:
+            pass
+
+
+def _enforce_budget(keep=None):
+    """超出内存上限时按最近最少使用移出数据集，先丢弃无引用的，再写入磁盘"""
+    if _resident_bytes <= MEMORY_BUDGET:
+        return
+    candidates = [key for key in _resident if key != keep]
+    unreferenced = [key for key in candidates if _entries[key]['refs'] <= 0]
+    referenced = [key for key in candidates if _entries[key]['refs'] > 0]
+    for key in unreferenced + referenced:
+        if _resident_bytes <= MEMORY_BUDGET:
+            break
+        _evict(key)
+
+
+@atexit.register
+def _cleanup():
+    shutil.rmtree(DATASET_DIR, ignore_errors=True)
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+美团订单与预订记录Excel文件解析
+"""
+
+import hashlib
+import io
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import pandas as pd
+
+import parallel
+import parse_cache
+import schema
+
+# 解析器版本：解析或清理逻辑变化时递增，使旧的磁盘缓存失效
+PARSER_VERSION = 2
+
+# 美团导出文件的表头可能位于第3、2、1行，或没有表头
+MEITUAN_HEADER_CANDIDATES = [2, 1, 0, None]
+# 匹配、手动匹配和预览中用到的美团订单列
+MEITUAN_COLUMNS = ['营业日期', '桌牌号', '下单时间', '支付合计', '结账方式', '订单状态']
+# 工作表数少于该值时串行处理，避免进程池启动开销超过收益
+PARALLEL_SHEET_THRESHOLD = 8
+
+
+def content_hash(data):
+    """上传文件内容的哈希值，用作解析缓存键"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def process_new_format_reservation(df):
+    """处理新格式的预定表（8月预定.xls格式）"""
+    if df.empty:
+        return df
+        
+    # 检测是否为新格式：第一行包含'包厢'和日期信息，且有很多Unnamed列
+    first_row = df.iloc[0] if len(df) > 0 else pd.Series()
+    unnamed_cols = [col for col in df.columns if 'Unnamed' in str(col)]
+    
+    # 新格式特征：第一行有'包厢'，且有多个Unnamed列
+    is_new_format = (
+        len(unnamed_cols) >= 5 and 
+        len(df) > 0 and 
+        pd.notna(first_row.iloc[0]) and 
+        str(first_row.iloc[0]) == '包厢'
+    )
+    
+    if is_new_format:
+        # 处理新格式
+        # 跳过第0行（表头行），从第1行开始读取数据
+        data_df = df.iloc[1:].copy()
+        
+        # 重新定义列名
+        new_columns = {
+            0: '包厢',
+            1: '市别', 
+            2: '预订时间',
+            3: '姓名',
+            4: '人数',
+            5: '联系电话',
+            6: '预订人',
+            7: '经手人',
+            8: '备注'
+        }
+        
+        # 重命名列
+        column_mapping = {}
+        for i, col in enumerate(data_df.columns):
+            if i in new_columns:
+                column_mapping[col] = new_columns[i]
+        
+        data_df = data_df.rename(columns=column_mapping)
+        
+        # 过滤掉空行和无效数据
+        data_df = data_df[data_df['包厢'].notna()]
+        data_df = data_df[data_df['包厢'] != '晚市']  # 过滤掉分隔行
+        
+        # 过滤掉总结行（包含"合计"的行）
+        data_df = data_df[~data_df['包厢'].astype(str).str.contains('合计', na=False)]
+        data_df = data_df[~data_df['包厢'].astype(str).str.contains('总计', na=False)]
+        data_df = data_df[~data_df['包厢'].astype(str).str.contains('小计', na=False)]
+        
+        # 从表头行提取日期信息
+        header_info = first_row.iloc[1] if len(first_row) > 1 else None
+        if pd.notna(header_info) and '月' in str(header_info):
+            # 解析日期信息，如"8月1号 星期五"
+            date_str = str(header_info)
+            try:
+                # 提取月份和日期
+                import re
+                match = re.search(r'(\d+)月(\d+)号', date_str)
+                if match:
+                    month = int(match.group(1))
+                    day = int(match.group(2))
+                    # 假设是当前年份
+                    current_year = datetime.now().year
+                    date_obj = datetime(current_year, month, day)
+                    data_df['日期'] = date_obj
+            except:
+                # 如果解析失败，使用当前日期
+                data_df['日期'] = datetime.now().date()
+        else:
+            data_df['日期'] = datetime.now().date()
+        
+        # 处理预订时间字段（新格式中可能是time对象）
+        if '预订时间' in data_df.columns:
+            def convert_time_format(time_val):
+                if pd.isna(time_val):
+                    return None
+                try:
+                    # 如果是time对象，转换为字符串
+                    if hasattr(time_val, 'strftime'):
+                        return time_val.strftime('%H:%M')
+                    # 如果是字符串，直接返回
+                    elif isinstance(time_val, str):
+                        return time_val
+                    # 其他情况转换为字符串
+                    else:
+                        return str(time_val)
+                except:
+                    return str(time_val) if time_val is not None else None
+            
+            data_df['预订时间'] = data_df['预订时间'].apply(convert_time_format)
+        
+        return data_df
+    else:
+        # 原格式，直接返回
+        return df
+
+
+def detect_meituan_header(excel_file):
+    """只读取表格前几行定位表头所在行，未找到时返回None"""
+    sniff_rows = max(row for row in MEITUAN_HEADER_CANDIDATES if row is not None) + 1
+    preview = excel_file.parse(header=None, nrows=sniff_rows)
+    for header_row in MEITUAN_HEADER_CANDIDATES:
+        # 没有表头时列名为序号，不可能包含关键列
+        if header_row is None or header_row >= len(preview):
+            continue
+        header_cells = [str(cell) for cell in preview.iloc[header_row] if pd.notna(cell)]
+        # 检查是否包含关键列
+        if any('营业日期' in cell for cell in header_cells) and \
+           any('桌牌号' in cell for cell in header_cells):
+            return header_row
+    return None
+
+
+def read_meituan_excel(source):
+    """读取并清理美团订单文件，无法识别格式时返回None"""
+    try:
+        excel_file = pd.ExcelFile(source)
+        header_row = detect_meituan_header(excel_file)
+        if header_row is None:
+            return None
+        # 定位表头后只完整解析一次，且只读取后续用到的列
+        meituan_df = excel_file.parse(
+            header=header_row,
+            usecols=lambda col: str(col) in MEITUAN_COLUMNS,
+        )
+    except Exception:
+        return None
+
+    # 清理数据：移除完全空的列和行
+    meituan_df = meituan_df.dropna(how='all', axis=1)  # 删除全空列
+    meituan_df = meituan_df.dropna(how='all', axis=0)  # 删除全空行
+    return schema.apply_meituan_schema(meituan_df)
+
+
+def clean_reservation_sheet(sheet_df, sheet_name):
+    """处理单个预订工作表，没有有效数据时返回空DataFrame"""
+    # 处理新格式的预定表（检测是否为新格式）
+    sheet_df = process_new_format_reservation(sheet_df)
+
+    # 清理数据：移除完全空的列和行
+    sheet_df = sheet_df.dropna(how='all', axis=1)  # 删除全空列
+    sheet_df = sheet_df.dropna(how='all', axis=0)  # 删除全空行
+
+    if not sheet_df.empty:
+        # 添加工作表名称列用于标识数据来源
+        sheet_df['数据来源工作表'] = sheet_name
+    return sheet_df
+
+
+def _excel_source(data):
+    """bytes包装为文件对象，路径等其他来源原样返回"""
+    return io.BytesIO(data) if isinstance(data, bytes) else data
+
+
+def _process_sheets(excel_file, sheet_names):
+    """依次处理工作表，返回 [(工作表名, DataFrame, 错误信息)]"""
+    results = []
+    for sheet_name in sheet_names:
+        try:
+            sheet_df = clean_reservation_sheet(excel_file.parse(sheet_name), sheet_name)
+            results.append((sheet_name, sheet_df, None))
+        except Exception as e:
+            results.append((sheet_name, None, str(e)))
+    return results
+
+
+def _read_sheet_chunk(data, sheet_names):
+    """工作进程入口：打开一次工作簿，处理分配到的一段连续工作表"""
+    with pd.ExcelFile(_excel_source(data)) as excel_file:
+        return _process_sheets(excel_file, sheet_names)
+
+
+def _process_sheets_parallel(data, sheet_names, workers):
+    """按工作表顺序切块后交给进程池处理，结果保持工作簿中的顺序"""
+    chunks = parallel.split_chunks(sheet_names, workers)
+    results = []
+    with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+        futures = [pool.submit(_read_sheet_chunk, data, chunk) for chunk in chunks]
+        for chunk, future in zip(chunks, futures):
+            try:
+                results.extend(future.result())
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                results.extend((sheet_name, None, str(e)) for sheet_name in chunk)
+    return results
+
+
+def read_reservation_excel(source, max_workers=None):
+    """读取预订记录文件的所有工作表并合并
+
+    工作表较多时按可用CPU核数启动进程池并行处理，每个工作进程只打开一次工作簿；
+    工作表较少时在当前进程中从同一个ExcelFile依次读取。
+    返回 (合并后的DataFrame, 有效工作表数, 处理失败的 [(工作表名, 错误信息)])，
+    没有有效数据时返回空DataFrame。
+    """
+    data = source.getvalue() if hasattr(source, 'getvalue') else source
+
+    results = None
+    with pd.ExcelFile(_excel_source(data)) as excel_file:
+        sheet_names = excel_file.sheet_names
+        workers = parallel.resolve_worker_count(max_workers, len(sheet_names))
+        if workers <= 1 or len(sheet_names) < PARALLEL_SHEET_THRESHOLD:
+            results = _process_sheets(excel_file, sheet_names)
+
+    if results is None:
+        try:
+            results = _process_sheets_parallel(data, sheet_names, workers)
+        except (OSError, BrokenProcessPool):
+            # 无法创建工作进程时退回串行处理
+            with pd.ExcelFile(_excel_source(data)) as excel_file:
+                results = _process_sheets(excel_file, sheet_names)
+
+    failed_sheets = [(sheet_name, error) for sheet_name, _, error in results if error is not None]
+    # 如果工作表有数据，添加到列表中
+    all_sheets_data = [
+        sheet_df for _, sheet_df, error in results
+        if error is None and not sheet_df.empty
+    ]
+
+    if not all_sheets_data:
+        return pd.DataFrame(), 0, failed_sheets
+
+    # 合并所有工作表的数据
+    reservation_df = pd.concat(all_sheets_data, ignore_index=True)
+    return schema.apply_reservation_schema(reservation_df), len(all_sheets_data), failed_sheets
+
+
+def load_meituan_upload(file_hash, file_bytes):
+    """解析上传的美团文件，优先读取磁盘上的列式缓存"""
+    cached = parse_cache.load('meituan', file_hash, PARSER_VERSION)
+    if cached is not None:
+        return cached[0]
+
+    meituan_df = read_meituan_excel(io.BytesIO(file_bytes))
+    if meituan_df is not None:
+        parse_cache.save('meituan', file_hash, PARSER_VERSION, meituan_df)
+    return meituan_df
+
+
+def load_reservation_upload(file_hash, file_bytes, max_workers=None):
+    """解析上传的预订文件，优先读取磁盘上的列式缓存"""
+    cached = parse_cache.load('reservation', file_hash, PARSER_VERSION)
+    if cached is not None:
+        reservation_df, meta = cached
+        return reservation_df, meta['valid_sheets'], [tuple(item) for item in meta['failed_sheets']]
+
+    reservation_df, valid_sheets, failed_sheets = read_reservation_excel(file_bytes, max_workers)
+    if not reservation_df.empty:
+        parse_cache.save('reservation', file_hash, PARSER_VERSION, reservation_df, {
+            'valid_sheets': valid_sheets,
+            'failed_sheets': failed_sheets,
+        })
+    return reservation_df, valid_sheets, failed_sheets
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+匹配结果导出
+
+带格式的Excel供人工查看；CSV、Parquet和JSON Lines供下游脚本读取，保留数值和日期时间类型。
+"""
+
+import io
+import os
+import re
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import pandas as pd
+
+import parallel
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# 导出格式 -> MIME类型（扩展名与格式名相同）
+FILE_FORMATS = {
+    'xlsx': XLSX_MIME,
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'jsonl': 'application/x-ndjson',
+}
+ZIP_MIME = 'application/zip'
+# 批量导出预订人明细时，总记录数达到该值才用进程池生成各预订人的工作簿
+CUSTOMER_PARALLEL_THRESHOLD = 20000
+# Excel工作表名的最大长度和不允许的字符；文件名中不允许的字符
+SHEET_TITLE_LENGTH = 31
+INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+INVALID_FILENAME_CHARS = re.compile(r'[\\/:*?"<>|]')
+# CSV和JSON Lines中日期时间的文本格式
+DATA_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+# 匹配结果表的样式：表头浅蓝底加粗，所有单元格细边框、居中、自动换行
+HEADER_FILL = '#E6F3FF'
+HEADER_FONT_SIZE = 12
+ROW_HEIGHT = 35
+HEADER_ROW_HEIGHT = 30
+DATETIME_FORMAT = 'yyyy-mm-dd hh:mm:ss'
+# 各列宽度 (最小宽度, 内容宽度余量, 最大宽度)，依次为A~F列：
+# 下单时间、预订人、桌牌号、支付合计、结账方式、匹配类型
+COLUMN_WIDTH_RULES = [(22, 4, 28), (15, 3, 25), (12, 3, 18), (15, 3, 22), (25, 5, 40), (12, 3, 18)]
+DEFAULT_WIDTH_RULE = (15, 3, 35)
+# Excel日期序列值的起点
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+# 导出时每批转换和写入的行数
+EXPORT_CHUNK_ROWS = 5000
+
+
+def display_widths(values):
+    """文本的显示宽度，中文等非ASCII字符按2个字符计算"""
+    text = values.astype(str)
+    return text.str.len() + text.str.count(r'[^\x00-\x7f]')
+
+
+def _width_for(position, max_length):
+    minimum, padding, maximum = COLUMN_WIDTH_RULES[position] if position < len(COLUMN_WIDTH_RULES) else DEFAULT_WIDTH_RULE
+    return max(minimum, min(max_length + padding, maximum))
+
+
+def _content_widths(chunk):
+    """各列内容的最大显示宽度，缺失值按空文本计算"""
+    if chunk.empty:
+        return [0] * len(chunk.columns)
+    return [
+        int(display_widths(chunk[col].astype(object).where(chunk[col].notna(), '')).max())
+        for col in chunk.columns
+    ]
+
+
+def _cell_values(values):
+    """列数据转为写入单元格的Python值，缺失值为None（写为带格式的空单元格）
+
+    日期时间转为Excel序列值、数值保持数值、其余转为文本，写入时不再逐个判断类型。
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        values = (values - EXCEL_EPOCH) / pd.Timedelta(days=1)
+    elif not pd.api.types.is_numeric_dtype(values):
+        values = values.astype(object).where(values.isna(), values.astype(str))
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+def _open_workbook(output):
+    """以 constant_memory 模式创建工作簿：已写完的行立即落到临时文件，内存占用与行数无关"""
+    import xlsxwriter
+
+    # 文本原样写入，不把'='开头的内容当公式、不把网址转为链接
+    return xlsxwriter.Workbook(output, {
+        'constant_memory': True,
+        'strings_to_formulas': False,
+        'strings_to_urls': False,
+    })
+
+
+def _write_frame(worksheet, df, header_format, cell_format, datetime_format,
+                 chunk_rows=EXPORT_CHUNK_ROWS, measure_widths=False):
+    """表头和数据按 chunk_rows 行一批写入工作表，每列一个格式对象
+
+    constant_memory 模式下必须按行顺序写入。measure_widths 为True时返回各列（含表头）
+    的最大显示宽度，否则返回None。
+    """
+    column_formats = []
+    column_writers = []
+    for col in df.columns:
+        values = df[col]
+        is_datetime = pd.api.types.is_datetime64_any_dtype(values)
+        column_formats.append(datetime_format if is_datetime else cell_format)
+        is_number = is_datetime or pd.api.types.is_numeric_dtype(values)
+        column_writers.append(worksheet.write_number if is_number else worksheet.write_string)
+
+    headers = [str(col) for col in df.columns]
+    worksheet.write_row(0, 0, headers, header_format)
+    max_lengths = display_widths(pd.Series(headers, dtype=object)).astype(int).tolist() if measure_widths else None
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        if measure_widths:
+            max_lengths = [max(current, width) for current, width in zip(max_lengths, _content_widths(chunk))]
+        columns = [_cell_values(chunk[col]) for col in chunk.columns]
+        for row, values in enumerate(zip(*columns), start + 1):
+            for position, value in enumerate(values):
+                if value is None:
+                    worksheet.write_blank(row, position, None, column_formats[position])
+                else:
+                    column_writers[position](row, position, value, column_formats[position])
+    return max_lengths
+
+
+def write_match_results(export_df, output, chunk_rows=EXPORT_CHUNK_ROWS):
+    """把匹配结果写入带格式的Excel，output为路径或文件对象
+
+    按 chunk_rows 行一批转换和写入，内存占用与导出行数无关。样式按列设置，
+    列宽在写入过程中逐批累计。
+    """
+    workbook = _open_workbook(output)
+    worksheet = workbook.add_worksheet('匹配结果')
+    cell_style = {'align': 'center', 'valign': 'vcenter', 'text_wrap': True, 'border': 1}
+    header_format = workbook.add_format(dict(cell_style, bold=True, font_size=HEADER_FONT_SIZE, bg_color=HEADER_FILL))
+    cell_format = workbook.add_format(cell_style)
+    datetime_format = workbook.add_format(dict(cell_style, num_format=DATETIME_FORMAT))
+    # 增加行高以适应多行内容，表头单独设置
+    worksheet.set_default_row(ROW_HEIGHT)
+    worksheet.set_row(0, HEADER_ROW_HEIGHT)
+
+    max_lengths = _write_frame(
+        worksheet, export_df, header_format, cell_format, datetime_format, chunk_rows, measure_widths=True
+    )
+    for position, max_length in enumerate(max_lengths):
+        worksheet.set_column(position, position, _width_for(position, max_length))
+    workbook.close()
+
+
+def typed_results(export_df):
+    """数据导出用的匹配结果：支付合计从两位小数文本还原为数值，空文本为缺失值"""
+    if '支付合计' not in export_df.columns:
+        return export_df
+    return export_df.assign(支付合计=pd.to_numeric(export_df['支付合计'], errors='coerce'))
+
+
+def write_data_results(export_df, output, file_format):
+    """把匹配结果写为CSV（UTF-8带BOM，Excel可直接打开）、Parquet或JSON Lines"""
+    export_df = typed_results(export_df)
+    if file_format == 'csv':
+        export_df.to_csv(output, index=False, encoding='utf-8-sig', date_format=DATA_DATETIME_FORMAT)
+    elif file_format == 'parquet':
+        export_df.to_parquet(output, index=False)
+    elif file_format == 'jsonl':
+        # 日期时间按ISO格式输出到秒，缺失值为null
+        export_df.to_json(output, orient='records', lines=True, force_ascii=False, date_format='iso', date_unit='s')
+    else:
+        raise ValueError(f"不支持的导出格式: {file_format}")
+
+
+def write_results(export_df, output, file_format='xlsx'):
+    """按格式写入匹配结果，output为路径"""
+    if file_format == 'xlsx':
+        write_match_results(export_df, output)
+    else:
+        write_data_results(export_df, output, file_format)
+
+
+def match_results_file(export_df, directory=None, file_format='xlsx'):
+    """把匹配结果写入临时目录下的文件，返回文件路径（由调用方删除）"""
+    fd, path = tempfile.mkstemp(suffix=f'.{file_format}', prefix='匹配结果_', dir=directory)
+    os.close(fd)
+    try:
+        write_results(export_df, path, file_format)
+    except Exception:
+        os.unlink(path)
+        raise
+    return Path(path)
+
+
+def _write_customer_sheets(customer_sheets, output):
+    """预订人明细写入工作簿，customer_sheets 为 [(工作表名, 明细DataFrame)]
+
+    样式与 pandas 默认导出相同：表头加粗带边框，数据不设格式，日期时间显示到秒。
+    """
+    workbook = _open_workbook(output)
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    datetime_format = workbook.add_format({'num_format': DATETIME_FORMAT})
+    for title, display_data in customer_sheets:
+        _write_frame(workbook.add_worksheet(title), display_data, header_format, None, datetime_format)
+    workbook.close()
+
+
+def customer_records_excel(display_data, customer_name):
+    """生成单个预订人的预订记录Excel文件内容"""
+    output = io.BytesIO()
+    _write_customer_sheets([(sheet_title(f'{customer_name}_预订记录'), display_data)], output)
+    return output.getvalue()
+
+
+def sheet_title(name, used=None):
+    """合法的Excel工作表名：去掉不允许的字符、截断到31个字符，与 used 中已有的名称重复时加序号"""
+    base = INVALID_SHEET_CHARS.sub('_', str(name)).strip("'")[:SHEET_TITLE_LENGTH] or '未命名'
+    if used is None:
+        return base
+    title = base
+    number = 2
+    while title.lower() in used:
+        suffix = f"_{number}"
+        title = base[:SHEET_TITLE_LENGTH - len(suffix)] + suffix
+        number += 1
+    used.add(title.lower())
+    return title
+
+
+def _unique_filename(name, used):
+    """压缩包内不重复的文件名"""
+    base = INVALID_FILENAME_CHARS.sub('_', str(name)).strip() or '未命名'
+    filename = f"{base}_预订记录.xlsx"
+    number = 2
+    while filename in used:
+        filename = f"{base}_{number}_预订记录.xlsx"
+        number += 1
+    used.add(filename)
+    return filename
+
+
+def _customer_workbooks(items):
+    """工作进程入口：依次生成一组预订人的工作簿"""
+    return [customer_records_excel(display_data, customer_name) for customer_name, display_data in items]
+
+
+def _customer_workbooks_parallel(items, workers):
+    """预订人切块后交给进程池生成工作簿，按原顺序返回"""
+    chunks = parallel.split_chunks(items, workers * 4)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [workbook for chunk_result in pool.map(_customer_workbooks, chunks) for workbook in chunk_result]
+
+
+def customers_workbook(customer_frames, output):
+    """所有预订人的明细写入一个工作簿，每人一个工作表"""
+    used = set()
+    _write_customer_sheets(
+        [(sheet_title(customer_name, used), display_data) for customer_name, display_data in customer_frames.items()],
+        output
+    )
+
+
+def write_customer_archive(customer_frames, output, single_workbook=False, max_workers=None):
+    """把各预订人的明细打包为zip，返回预订人数
+
+    customer_frames 为 {预订人: 明细DataFrame}。默认每人一个工作簿，记录较多时用进程池并行生成；
+    single_workbook 为True时所有预订人放在一个多工作表的工作簿中。
+    """
+    # xlsx本身已压缩，压缩包内直接存储
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) as archive:
+        if single_workbook:
+            with archive.open('预订人明细.xlsx', 'w') as workbook_file:
+                customers_workbook(customer_frames, workbook_file)
+            return len(customer_frames)
+
+        items = list(customer_frames.items())
+        workers = parallel.resolve_worker_count(max_workers, len(items))
+        workbooks = None
+        total_rows = sum(len(display_data) for _, display_data in items)
+        if workers > 1 and total_rows >= CUSTOMER_PARALLEL_THRESHOLD:
+            try:
+                workbooks = _customer_workbooks_parallel(items, workers)
+            except (OSError, BrokenProcessPool):
+                # 无法创建工作进程时退回串行处理
+                workbooks = None
+        if workbooks is None:
+            workbooks = _customer_workbooks(items)
+
+        used = set()
+        for (customer_name, _), workbook in zip(items, workbooks):
+            archive.writestr(_unique_filename(customer_name, used), workbook)
+    return len(items)
@@ -97,6 +97,11 @@ def open_browser():
     webbrowser.open("http://localhost:8501")
 
 def main():
+    # 批量模式：python launcher.py batch 美团目录 预订目录 -o 输出目录
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        import batch_match
+        sys.exit(batch_match.main(sys.argv[2:]))
+    
     print("🚀 启动鹭府预定匹配工具...")
     
     # 检查服务是否已在运行
@@ -0,0 +1,619 @@
+# -*- coding: utf-8 -*-
+"""
+预订记录与美团订单匹配引擎
+
+按 (日期, 市别, 桌牌键) 对两侧数据各分组一次，再批量连接，
+替代逐条预订遍历全部订单的嵌套循环。
+"""
+
+import hashlib
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import parallel
+import schema
+
+# 新格式包厢关键词
+ROOM_KEYWORDS = ['福禄', '喜乐', '大厅', '包厢', '雅间']
+# 外卖订单关键词
+TAKEOUT_KEYWORDS = ['外卖', 'takeout', '配送', '打包']
+
+# 匹配成功后从美团订单带入结果的字段
+ORDER_FIELDS = ['支付合计', '下单时间', '下单时间_格式化', '结账方式']
+
+
+# 支付金额：结账方式中的第一个数字（包括负数和小数）
+PAYMENT_PATTERN = r'(-?\d+\.?\d*)'
+# 午市: 6:00-16:00, 晚市: 16:00-24:00，其余为非营业时间
+MARKET_PERIOD_BINS = [6, 16, 24]
+MARKET_PERIOD_LABELS = ['午市', '晚市']
+# 匹配规则版本：桌牌匹配规则或结果列变化时递增，使共享的匹配结果缓存失效
+MATCH_RULE_VERSION = 1
+# 两侧参与连接的记录总数少于该值时串行处理，避免进程池启动和数据传输开销超过收益
+PARALLEL_MATCH_THRESHOLD = 200000
+# 并行时每个工作进程分到的分区块数，块越多进度越细、负载越均衡
+CHUNKS_PER_WORKER = 4
+
+# 订单分配方式：每条预订关联全部匹配订单，一对一分配时间最近的订单，
+# 或按匹配类型和时间差求一对一最优分配
+ASSIGN_ALL = 'all'
+ASSIGN_NEAREST = 'nearest'
+ASSIGN_OPTIMAL = 'optimal'
+# 一对一最优分配时各匹配类型的优先级，时间接近程度只在同一优先级内起作用
+MATCH_TYPE_PRIORITY = {
+    '完全匹配': 5,
+    '包厢匹配': 4,
+    '数字匹配': 3,
+    '包厢外卖匹配': 2,
+    '外卖匹配': 1,
+}
+# 预订时间所在的列（新格式为'预订时间'，旧格式为'时间'）
+RESERVATION_TIME_COLUMNS = ['预订时间', '时间']
+# 按时间就近分配时，预订时间与下单时间相差超过该值不再分配
+DEFAULT_TIME_TOLERANCE = pd.Timedelta(hours=3)
+# 预订时间文本中的 时:分
+CLOCK_PATTERN = r'(\d{1,2})[:：](\d{2})'
+
+
+def extract_payment_amounts(payment_texts):
+    """从结账方式中提取支付金额，无法提取时为NaN"""
+    amounts = payment_texts.astype(str).str.extract(PAYMENT_PATTERN, expand=False)
+    return pd.to_numeric(amounts, errors='coerce')
+
+
+def market_periods(order_times):
+    """根据下单时间的小时判断市别，非营业时间或时间缺失时为None"""
+    hours = order_times.dt.hour
+    periods = pd.cut(hours, bins=MARKET_PERIOD_BINS, labels=MARKET_PERIOD_LABELS, right=False)
+    return periods.astype(object).where(periods.notna(), None)
+
+
+@lru_cache(maxsize=1)
+def _clock_labels():
+    """一天中每一秒对应的 HH:MM:SS 文本，按秒查表代替逐条strftime"""
+    return np.array([
+        f"{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}"
+        for second in range(24 * 3600)
+    ], dtype=object)
+
+
+def format_clock_times(order_times):
+    """下单时间格式化为 HH:MM:SS，时间缺失时为None"""
+    seconds = (order_times - order_times.dt.normalize()) // pd.Timedelta(seconds=1)
+    valid = seconds.notna().to_numpy()
+    labels = np.full(len(order_times), None, dtype=object)
+    labels[valid] = _clock_labels()[seconds[valid].to_numpy(dtype=np.int64)]
+    return pd.Series(labels, index=order_times.index)
+
+
+def settled_orders(meituan_df):
+    """筛选已结账且营业日期有效的订单，并从结账方式中提取支付合计"""
+    df = schema.apply_meituan_schema(meituan_df)
+    if '订单状态' in df.columns:
+        df = df[df['订单状态'] == '已结账']
+    if '营业日期' in df.columns:
+        # 营业日期为'--'等无效值时已记为NaT
+        df = df[df['营业日期'].notna()]
+    if '结账方式' in df.columns:
+        df = df.assign(支付合计=extract_payment_amounts(df['结账方式']))
+    return df
+
+
+def preprocess_orders(meituan_df):
+    """美团订单预处理：向量化完成金额提取、市别划分和时间格式化
+
+    返回用于匹配的订单表，只包含营业时间内的已结账订单。
+    """
+    df = settled_orders(meituan_df)
+
+    # 选择需要的列，保留下单时间和结账方式用于显示
+    mt_df = df[['营业日期', '桌牌号', '下单时间', '支付合计', '结账方式']].copy(deep=False)
+    mt_df.insert(4, '市别', market_periods(mt_df['下单时间']))
+    # 过滤掉非营业时间的订单
+    mt_df = mt_df[mt_df['市别'].notna()]
+
+    # 格式化下单时间为更易读的格式
+    mt_df['下单时间_格式化'] = format_clock_times(mt_df['下单时间'])
+    return mt_df
+
+
+def reservation_times(reservations):
+    """预订日期加上预订时间（HH:MM）得到预订时刻，没有预订时间时为NaT"""
+    dates = pd.to_datetime(reservations['日期'], errors='coerce').dt.normalize()
+    time_col = next((col for col in RESERVATION_TIME_COLUMNS if col in reservations.columns), None)
+    if time_col is None:
+        return pd.Series(pd.NaT, index=reservations.index, dtype='datetime64[ns]')
+    clock = reservations[time_col].astype(str).str.extract(CLOCK_PATTERN).astype(float)
+    offsets = pd.to_timedelta(clock[0] * 60 + clock[1], unit='min')
+    # 超出一天范围的时间视为无效
+    offsets = offsets.where(offsets < pd.Timedelta(days=1))
+    return dates + offsets
+
+
+def partition_labels(dates, markets):
+    """(日期, 市别) 分区标签，如'2025-08-01|午市'；缺失的日期和市别分别为'NaT'和'nan'"""
+    dates = pd.to_datetime(dates, errors='coerce').dt.normalize()
+    return dates.astype(str).str.cat(markets.astype(object).astype(str), sep='|')
+
+
+def _group_fingerprints(frame, labels):
+    """按分区标签计算内容指纹：分区内各行哈希按原顺序拼接后再取摘要"""
+    row_hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    return {
+        label: hashlib.blake2b(row_hashes[positions].tobytes(), digest_size=16).hexdigest()
+        for label, positions in pd.Series(row_hashes).groupby(labels.to_numpy()).indices.items()
+    }
+
+
+def partition_fingerprints(reservations, orders):
+    """两侧每个 (日期, 市别) 分区的内容指纹 {分区标签: (预订指纹, 订单指纹)}
+
+    匹配只在同一分区内进行，两侧指纹都不变的分区匹配结果也不变。
+    """
+    res_fingerprints = _group_fingerprints(
+        reservations, partition_labels(reservations['日期'], reservations['市别'])
+    )
+    mt_fingerprints = _group_fingerprints(
+        orders, partition_labels(orders['下单时间'], orders['市别'])
+    )
+    return {
+        label: (res_fingerprints.get(label), mt_fingerprints.get(label))
+        for label in res_fingerprints.keys() | mt_fingerprints.keys()
+    }
+
+
+def extract_numbers(table_str):
+    """提取桌牌号中的数字部分"""
+    if pd.isna(table_str):
+        return None
+    numbers = re.findall(r'\d+', str(table_str))
+    return ''.join(numbers) if numbers else None
+
+
+def room_keyword_mask(table_str):
+    """包厢名称关键词位掩码，第 i 位对应 ROOM_KEYWORDS[i]"""
+    if pd.isna(table_str):
+        return 0
+    table_str = str(table_str).lower()
+    mask = 0
+    for bit, keyword in enumerate(ROOM_KEYWORDS):
+        if keyword in table_str:
+            mask |= 1 << bit
+    return mask
+
+
+def is_takeout(table_str):
+    """判断是否为外卖订单"""
+    if pd.isna(table_str):
+        return False
+    table_str = str(table_str).lower()
+    return any(keyword in table_str for keyword in TAKEOUT_KEYWORDS)
+
+
+# 桌牌号解析结果：原字符串、数字部分、包厢关键词位掩码、是否外卖
+TableKey = namedtuple('TableKey', ['text', 'digits', 'room_mask', 'takeout'])
+
+
+@lru_cache(maxsize=4096)
+def parse_table_key(table_str):
+    """解析桌牌号特征（按字符串缓存，同一桌牌号只解析一次）"""
+    return TableKey(
+        text=table_str,
+        digits=extract_numbers(table_str),
+        room_mask=room_keyword_mask(table_str),
+        takeout=is_takeout(table_str),
+    )
+
+
+def table_key_match(res_key, mt_key):
+    """比较两个已解析的桌牌号，返回 (是否匹配, 匹配类型)"""
+    # 完全匹配（最高优先级）
+    if res_key.text == mt_key.text:
+        return True, "完全匹配"
+
+    digits_equal = res_key.digits is not None and res_key.digits == mt_key.digits
+
+    # 包厢名称 + 数字匹配（新格式支持）
+    if digits_equal and res_key.room_mask & mt_key.room_mask:
+        return True, "包厢外卖匹配" if mt_key.takeout else "包厢匹配"
+
+    # 数字部分匹配（传统匹配方式），区分外卖和堂食
+    if digits_equal:
+        return True, "外卖匹配" if mt_key.takeout else "数字匹配"
+
+    return False, "无匹配"
+
+
+def smart_table_match(reservation_table, meituan_table):
+    """智能桌牌号匹配函数 - 支持新格式包厢名称"""
+    return table_key_match(
+        parse_table_key(str(reservation_table)),
+        parse_table_key(str(meituan_table)),
+    )
+
+
+class TableKeyIndex:
+    """桌牌号特征索引
+
+    一次匹配中两侧共用同一个索引：每个不同的桌牌号分配一个整数编码并只解析一次，
+    之后连接和匹配类型判定都在编码数组上向量化完成，不再逐对比较字符串。
+    """
+
+    def __init__(self):
+        self._codes = {}
+        self._digit_codes = {}
+        self._keys = []
+        self._digit_ids = []
+
+    def encode(self, tables):
+        """将桌牌号列编码为整数数组（字符串形式相同的值编码相同）
+
+        缺失值按字符串'nan'处理，与 smart_table_match 中 str() 的比较方式一致。
+        """
+        codes, uniques = pd.factorize(tables, use_na_sentinel=False)
+        lookup = np.empty(len(uniques), dtype=np.int64)
+        for i, value in enumerate(uniques):
+            table = str(value)
+            if table not in self._codes:
+                key = parse_table_key(table)
+                self._codes[table] = len(self._keys)
+                self._keys.append(key)
+                if key.digits is None:
+                    self._digit_ids.append(-1)
+                else:
+                    self._digit_ids.append(self._digit_codes.setdefault(key.digits, len(self._digit_codes)))
+            lookup[i] = self._codes[table]
+        return lookup[codes]
+
+    def _feature_arrays(self):
+        digit_ids = np.array(self._digit_ids, dtype=np.int64)
+        room_masks = np.array([key.room_mask for key in self._keys], dtype=np.int64)
+        takeouts = np.array([key.takeout for key in self._keys], dtype=bool)
+        return digit_ids, room_masks, takeouts
+
+    def join_keys(self, codes):
+        """连接键：有数字时取数字编码，否则取字符串编码的负值
+
+        smart_table_match 只在字符串完全相同或数字部分相同时判定匹配，
+        完全相同的字符串数字部分必然相同，因此连接键相等即为候选匹配；
+        两类键分别落在非负与负数区间，互不冲突。
+        """
+        digit_ids = self._feature_arrays()[0][codes]
+        return np.where(digit_ids >= 0, digit_ids, -(codes + 1))
+
+    def match_types(self, res_codes, mt_codes):
+        """按编码向量化判定匹配类型，规则与 table_key_match 相同"""
+        digit_ids, room_masks, takeouts = self._feature_arrays()
+        res_digits = digit_ids[res_codes]
+        exact = res_codes == mt_codes
+        digits_equal = (res_digits >= 0) & (res_digits == digit_ids[mt_codes])
+        room = digits_equal & ((room_masks[res_codes] & room_masks[mt_codes]) != 0)
+        takeout = takeouts[mt_codes]
+        return np.select(
+            [exact, room & takeout, room, digits_equal & takeout, digits_equal],
+            ['完全匹配', '包厢外卖匹配', '包厢匹配', '外卖匹配', '数字匹配'],
+            default='无匹配',
+        ).astype(object)
+
+
+def _join_partition(res_part, mt_part):
+    """同一 (日期, 市别) 分区内按桌牌键连接，返回候选匹配的 (预订位置, 订单位置)"""
+    pairs = res_part.merge(mt_part, on='_key', how='inner')
+    return pairs['_res_pos'].to_numpy(), pairs['_mt_pos'].to_numpy()
+
+
+def _join_partitions(partition_pairs):
+    """工作进程入口：依次连接一组分区"""
+    return [_join_partition(res_part, mt_part) for res_part, mt_part in partition_pairs]
+
+
+def _join_serial(partition_pairs, report):
+    results = []
+    for res_part, mt_part in partition_pairs:
+        results.append(_join_partition(res_part, mt_part))
+        report(1)
+    return results
+
+
+def _join_parallel(partition_pairs, workers, report):
+    """分区切块后交给进程池连接，块完成的先后顺序不影响结果（最后统一排序）"""
+    chunks = parallel.split_chunks(partition_pairs, workers * CHUNKS_PER_WORKER)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_join_partitions, chunk): len(chunk) for chunk in chunks}
+        for future in as_completed(futures):
+            results.extend(future.result())
+            report(futures[future])
+    return results
+
+
+def _join_candidates(res_side, mt_side, progress_callback, max_workers):
+    """按 (日期, 市别) 分区连接出全部候选匹配，返回 (预订位置, 订单位置)"""
+    partition_cols = ['_date', '_market']
+    mt_partitions = dict(tuple(mt_side.groupby(partition_cols, sort=False)))
+    partition_pairs = []
+    for partition, res_part in res_side.groupby(partition_cols, sort=True):
+        mt_part = mt_partitions.get(partition)
+        if mt_part is not None:
+            partition_pairs.append((res_part, mt_part))
+
+    total = len(partition_pairs)
+    done = [0]
+
+    def report(count):
+        done[0] += count
+        if progress_callback is not None:
+            progress_callback(done[0], total)
+
+    workers = parallel.resolve_worker_count(max_workers, total)
+    results = None
+    if workers > 1 and len(res_side) + len(mt_side) >= PARALLEL_MATCH_THRESHOLD:
+        try:
+            results = _join_parallel(partition_pairs, workers, report)
+        except (OSError, BrokenProcessPool):
+            # 无法创建工作进程时退回串行处理
+            done[0] = 0
+    if results is None:
+        results = _join_serial(partition_pairs, report)
+
+    res_chunks = [part_res_pos for part_res_pos, _ in results]
+    mt_chunks = [part_mt_pos for _, part_mt_pos in results]
+    res_pos = np.concatenate(res_chunks) if res_chunks else np.empty(0, dtype=np.int64)
+    mt_pos = np.concatenate(mt_chunks) if mt_chunks else np.empty(0, dtype=np.int64)
+    return res_pos, mt_pos
+
+
+def _assign_nearest(res_side, mt_side, tolerance):
+    """按时间就近一对一分配订单，返回 (预订位置, 订单位置)
+
+    候选订单与预订的 (日期, 市别, 桌牌键) 相同。每一轮为每条待分配的预订取同组中时间
+    最近的可用订单；同一订单被多条预订选中时归时间差最小的预订（相同时归靠前的预订），
+    其余预订在下一轮从同组的剩余订单中继续选择，直到没有新的分配。
+    订单按 (组, 时间) 排序，每轮对待分配的预订做一次二分查找，之后的轮次只涉及仍有争抢的
+    组的订单，总开销为 O(n log n) 加上争抢组内的多轮分配。
+    没有预订时间的预订最后处理，分配当天该桌最早的剩余订单。
+    """
+    by = ['_date', '_market', '_key']
+    mt_side = mt_side[mt_side['_time'].notna()]
+    groups = pd.concat([res_side[by], mt_side[by]], ignore_index=True) \
+        .groupby(by, sort=False).ngroup().to_numpy()
+
+    # 没有预订时间的预订从当天零点向后查找
+    timed = res_side['_time'].notna().to_numpy()
+    res_times = res_side['_time'].where(timed, res_side['_date']).to_numpy('datetime64[ns]').view('int64')
+    mt_times = mt_side['_time'].to_numpy('datetime64[ns]').view('int64')
+    # (组, 时间) 合成一个整数排序键，时间取两侧合并后的名次
+    unique_times, time_ranks = np.unique(np.concatenate([res_times, mt_times]), return_inverse=True)
+    sort_keys = groups * (len(unique_times) + 1) + time_ranks.reshape(-1)
+    res_keys = sort_keys[:len(res_side)]
+    mt_keys = sort_keys[len(res_side):]
+
+    mt_positions = mt_side['_mt_pos'].to_numpy()
+    order = np.lexsort((mt_positions, mt_keys))
+    available = (groups[len(res_side):][order], mt_keys[order], mt_times[order], mt_positions[order])
+    limit = pd.Timedelta(tolerance).value
+    res_chunks = []
+    mt_chunks = []
+    for mask, nearest, round_limit in ((timed, True, limit), (~timed, False, None)):
+        pending = (groups[:len(res_side)][mask], res_keys[mask], res_times[mask], res_side['_res_pos'].to_numpy()[mask])
+        available = _nearest_rounds(pending, available, nearest, round_limit, res_chunks, mt_chunks)
+
+    res_pos = np.concatenate(res_chunks) if res_chunks else np.empty(0, dtype=np.int64)
+    mt_pos = np.concatenate(mt_chunks) if mt_chunks else np.empty(0, dtype=np.int64)
+    return res_pos, mt_pos
+
+
+def _nearest_rounds(pending, available, nearest, limit, res_chunks, mt_chunks):
+    """逐轮分配订单，结果追加到 res_chunks/mt_chunks，返回剩余的订单
+
+    pending 为待分配预订的 (组, 排序键, 时间, 预订位置)，available 为按排序键排列的
+    订单 (组, 排序键, 时间, 订单位置)。nearest 为True时取前后最近的订单（时间差相同时
+    取较早的），否则取不早于预订时间的第一条订单；同一时间有多条订单时取订单位置靠前的。
+    limit 为允许的最大时间差（纳秒），None 表示不限。
+    """
+    res_groups, res_keys, res_times, res_positions = pending
+    mt_groups, mt_keys, mt_times, mt_positions = available
+    # 可用订单在 available 中的下标，每轮只保留仍有待分配预订的组
+    rows = np.arange(len(mt_groups))
+    taken = np.zeros(len(mt_groups), dtype=bool)
+    while len(res_groups):
+        rows = rows[np.isin(mt_groups[rows], res_groups)]
+        if not len(rows):
+            break
+        row_groups = mt_groups[rows]
+        row_times = mt_times[rows]
+        last = len(rows) - 1
+
+        row_keys = mt_keys[rows]
+        after = np.searchsorted(row_keys, res_keys, side='left')
+        clipped = np.minimum(after, last)
+        after_valid = (after <= last) & (row_groups[clipped] == res_groups)
+        choice = np.where(after_valid, clipped, -1)
+        distance = row_times[clipped] - res_times
+        if nearest:
+            # 不晚于预订时间的最后一个时间点，同一时间点有多条订单时取其中第一条
+            before = np.searchsorted(row_keys, res_keys, side='right') - 1
+            clipped = np.maximum(before, 0)
+            before = np.where(before >= 0, np.searchsorted(row_keys, row_keys[clipped], side='left'), -1)
+            clipped = np.maximum(before, 0)
+            before_distance = res_times - row_times[clipped]
+            use_before = (before >= 0) & (row_groups[clipped] == res_groups) \
+                & (~after_valid | (before_distance <= distance))
+            choice = np.where(use_before, clipped, choice)
+            distance = np.where(use_before, before_distance, distance)
+        found = choice >= 0
+        if limit is not None:
+            found &= distance <= limit
+        if not found.any():
+            break
+
+        # 每条订单归时间差最小的预订，相同时归靠前的预订
+        candidates = np.flatnonzero(found)
+        candidates = candidates[np.lexsort((res_positions[candidates], distance[candidates]))]
+        _, first = np.unique(choice[candidates], return_index=True)
+        winners = candidates[first]
+        won_rows = rows[choice[winners]]
+        res_chunks.append(res_positions[winners])
+        mt_chunks.append(mt_positions[won_rows])
+        taken[won_rows] = True
+        rows = rows[~taken[rows]]
+
+        # 没有候选的预订在订单减少后也不会有候选，不再参与下一轮
+        found[winners] = False
+        res_groups, res_keys, res_times, res_positions = \
+            res_groups[found], res_keys[found], res_times[found], res_positions[found]
+    rest = ~taken
+    return mt_groups[rest], mt_keys[rest], mt_times[rest], mt_positions[rest]
+
+
+def _assignment_weights(match_types, res_times, order_times, tolerance):
+    """候选匹配的权重：匹配类型优先级为主，时间越接近加分越多（不超过一个优先级）
+
+    没有预订时间或下单时间时不加分。
+    """
+    priorities = pd.Series(match_types).map(MATCH_TYPE_PRIORITY).fillna(0).to_numpy(dtype=float)
+    distances = np.abs((res_times - order_times) / tolerance)
+    closeness = np.nan_to_num(1 - np.minimum(distances, 1), nan=0.0)
+    return priorities * 2 + closeness
+
+
+def _resolve_one_to_one(res_pos, mt_pos, weights, components):
+    """在每个连通分量内求最大权一对一分配，返回保留的候选匹配掩码
+
+    候选匹配只在 (日期, 市别, 桌牌键) 相同的预订和订单之间产生，同一个分量内任意预订
+    和订单都互为候选，构成完全二部图。只有一侧的分量直接取权重最大的一条，
+    两侧都有多条记录的分量用匈牙利算法（linear_sum_assignment）求解。
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    keep = np.zeros(len(res_pos), dtype=bool)
+    if not len(res_pos):
+        return keep
+
+    candidates = pd.DataFrame({
+        'component': components,
+        'res_pos': res_pos,
+        'mt_pos': mt_pos,
+        'weight': weights,
+    })
+    grouped = candidates.groupby('component', sort=False)
+    res_counts = grouped['res_pos'].transform('nunique').to_numpy()
+    mt_counts = grouped['mt_pos'].transform('nunique').to_numpy()
+
+    # 只有一条预订或一条订单的分量：取权重最大的候选（相同时取靠前的）
+    single = (res_counts == 1) | (mt_counts == 1)
+    best = candidates[single].sort_values('weight', ascending=False, kind='stable') \
+        .drop_duplicates('component')
+    keep[best.index.to_numpy()] = True
+
+    # 多对多的分量：匈牙利算法求最大权分配，按分量排序后逐段切片，避免逐组构造DataFrame
+    multi = np.flatnonzero(~single)
+    multi = multi[np.argsort(components[multi], kind='stable')]
+    boundaries = np.flatnonzero(np.diff(components[multi])) + 1
+    for part in np.split(multi, boundaries) if len(multi) else []:
+        res_ids, res_inverse = np.unique(res_pos[part], return_inverse=True)
+        mt_ids, mt_inverse = np.unique(mt_pos[part], return_inverse=True)
+        weight_matrix = np.zeros((len(res_ids), len(mt_ids)))
+        weight_matrix[res_inverse, mt_inverse] = weights[part]
+        position_matrix = np.zeros((len(res_ids), len(mt_ids)), dtype=np.int64)
+        position_matrix[res_inverse, mt_inverse] = part
+        rows, cols = linear_sum_assignment(weight_matrix, maximize=True)
+        keep[position_matrix[rows, cols]] = True
+    return keep
+
+
+def match_reservations(reservations, orders, progress_callback=None, max_workers=None,
+                       assignment=ASSIGN_ALL, tolerance=DEFAULT_TIME_TOLERANCE):
+    """批量匹配预订记录与美团订单
+
+    reservations 需包含 日期、市别、桌牌号 列；orders 需包含
+    下单时间、市别、桌牌号 以及 ORDER_FIELDS 中的字段。
+    每条预订与其所有匹配订单各生成一条记录，未匹配的预订保留一条空记录，
+    记录顺序与逐条遍历的结果一致（预订顺序，同一预订内按订单顺序）。
+    只有同一天、同一市别的预订和订单才可能匹配，两侧按 (日期, 市别) 分区后逐个连接；
+    数据量较大时分区交给进程池并行连接，max_workers 为进程数（默认按可用CPU核数，
+    传1时始终串行）。
+    progress_callback(已完成分区数, 分区总数) 在分区连接完成后调用。
+    assignment 为 ASSIGN_NEAREST 时改为一对一分配：每条预订只关联预订时间与下单时间
+    最接近（相差不超过 tolerance）的一条订单，每条订单最多分配给一条预订。
+    assignment 为 ASSIGN_OPTIMAL 时在全部候选匹配上按匹配类型优先级和时间差（按 tolerance
+    归一化）求最大权一对一分配，解决多条预订同时匹配到同一订单的冲突。
+    """
+    reservations = reservations.reset_index(drop=True)
+    orders = orders.reset_index(drop=True)
+
+    table_index = TableKeyIndex()
+    res_codes = table_index.encode(reservations['桌牌号'])
+    mt_codes = table_index.encode(orders['桌牌号'])
+
+    res_side = pd.DataFrame({
+        '_res_pos': np.arange(len(reservations)),
+        '_date': pd.to_datetime(reservations['日期'], errors='coerce').dt.normalize(),
+        '_market': reservations['市别'].astype(object),
+        '_key': table_index.join_keys(res_codes),
+    })
+    mt_side = pd.DataFrame({
+        '_mt_pos': np.arange(len(orders)),
+        '_date': pd.to_datetime(orders['下单时间'], errors='coerce').dt.normalize(),
+        '_market': orders['市别'].astype(object),
+        '_key': table_index.join_keys(mt_codes),
+    })
+    # 日期或市别缺失的记录不参与匹配
+    res_side = res_side[res_side['_date'].notna() & res_side['_market'].notna()]
+    mt_side = mt_side[mt_side['_date'].notna() & mt_side['_market'].notna()]
+
+    if assignment == ASSIGN_NEAREST:
+        res_side = res_side.assign(_time=reservation_times(reservations))
+        mt_side = mt_side.assign(_time=pd.to_datetime(orders['下单时间'], errors='coerce'))
+        res_pos, mt_pos = _assign_nearest(res_side, mt_side, tolerance)
+        if progress_callback is not None:
+            progress_callback(1, 1)
+    else:
+        res_pos, mt_pos = _join_candidates(res_side, mt_side, progress_callback, max_workers)
+
+    if assignment == ASSIGN_OPTIMAL:
+        components = np.full(len(reservations), -1, dtype=np.int64)
+        components[res_side['_res_pos'].to_numpy()] = \
+            res_side.groupby(['_date', '_market', '_key'], sort=False).ngroup().to_numpy()
+        weights = _assignment_weights(
+            table_index.match_types(res_codes[res_pos], mt_codes[mt_pos]),
+            reservation_times(reservations).to_numpy()[res_pos],
+            pd.to_datetime(orders['下单时间'], errors='coerce').to_numpy()[mt_pos],
+            tolerance,
+        )
+        keep = _resolve_one_to_one(res_pos, mt_pos, weights, components[res_pos])
+        res_pos = res_pos[keep]
+        mt_pos = mt_pos[keep]
+
+    order = np.lexsort((mt_pos, res_pos))
+    res_pos = res_pos[order]
+    mt_pos = mt_pos[order]
+
+    match_types = table_index.match_types(res_codes[res_pos], mt_codes[mt_pos])
+
+    # 未匹配的预订按原字段类型补空值（NaT/NaN）
+    order_fields = orders[ORDER_FIELDS]
+    matched = pd.concat([
+        reservations.take(res_pos).reset_index(drop=True),
+        order_fields.take(mt_pos).reset_index(drop=True),
+    ], axis=1)
+    matched['匹配类型'] = match_types
+    matched['_res_pos'] = res_pos
+
+    unmatched_pos = np.setdiff1d(np.arange(len(reservations)), res_pos)
+    unmatched = pd.concat([
+        reservations.take(unmatched_pos).reset_index(drop=True),
+        order_fields.iloc[:0].reindex(np.arange(len(unmatched_pos))),
+    ], axis=1)
+    unmatched['匹配类型'] = '未匹配'
+    unmatched['_res_pos'] = unmatched_pos
+
+    merged = pd.concat([matched, unmatched], ignore_index=True)
+    merged = merged.sort_values('_res_pos', kind='stable')
+    return merged.drop(columns='_res_pos').reset_index(drop=True)
@@ -0,0 +1,766 @@
+# -*- coding: utf-8 -*-
+"""
+预订匹配核心逻辑（不依赖Streamlit）
+
+文件加载、新格式预订表处理、匹配、筛选和导出都在这里完成，输入为DataFrame、
+文件路径或文件内容，返回结果数据。Streamlit界面、批处理和基准测试都基于这里的
+ReservationMatcher，可以在工作进程中直接导入使用。
+"""
+
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import dataset_store
+import excel_loader
+import exporter
+import match_engine
+import result_cache
+import schema
+
+# 结果筛选选项
+FILTER_OPTIONS = ["全部记录", "已匹配记录", "未匹配记录"]
+# 导出选项
+EXPORT_OPTIONS = ["仅搜索", "全部（按时间排列）"]
+# 订单分配方式
+ASSIGNMENT_OPTIONS = {
+    "全部匹配订单": match_engine.ASSIGN_ALL,
+    "按时间就近（一对一）": match_engine.ASSIGN_NEAREST,
+    "最优分配（一对一，按匹配类型和时间）": match_engine.ASSIGN_OPTIMAL,
+}
+# 导出文件格式
+FILE_FORMAT_OPTIONS = {
+    "Excel（带格式）": 'xlsx',
+    "CSV（UTF-8，Excel可直接打开）": 'csv',
+    "Parquet": 'parquet',
+    "JSON Lines": 'jsonl',
+}
+# 预订人明细中显示和导出的列（存在时）
+CUSTOMER_RECORD_COLUMNS = ['日期', '桌牌号', '匹配状态', '匹配类型', '支付合计', '下单时间']
+# 手动匹配记录的匹配类型
+MANUAL_MATCH_TYPE = '手动匹配'
+# 导出的列
+EXPORT_COLUMNS = ['下单时间', '预订人', '桌牌号', '支付合计', '结账方式', '匹配类型']
+
+
+def standardize_search_keyword(keyword):
+    """预订人搜索关键词展开为所有同义写法"""
+    keyword = keyword.strip()
+    if keyword in ['平和', '平哥']:
+        return ['平和', '平哥']  # 返回所有同义词
+    elif keyword in ['刘霞', '刘']:
+        return ['刘霞', '刘']  # 返回刘霞和刘的所有变体
+    elif keyword in ['周', '周思玗']:
+        return ['周', '周思玗']  # 返回周和周思玗的所有变体
+    elif keyword.lower() == 'sk':
+        return ['SK', 'sk', 'Sk', 'sK']  # 返回所有大小写变体
+    else:
+        return [keyword]
+
+
+def filter_results(merged_df, filter_option="全部记录", search_keyword=""):
+    """按匹配状态筛选并按预订人搜索匹配结果"""
+    display_df = merged_df
+    
+    if filter_option == "已匹配记录":
+        display_df = display_df[display_df['匹配状态'] == '已匹配']
+    elif filter_option == "未匹配记录":
+        display_df = display_df[display_df['匹配状态'] == '未匹配']
+    
+    if search_keyword and '预订人' in display_df.columns:
+        search_terms = standardize_search_keyword(search_keyword)
+        # 创建搜索条件，匹配任何一个同义词
+        search_condition = False
+        for term in search_terms:
+            search_condition |= display_df['预订人'].astype(str).str.contains(term, case=False, na=False)
+        display_df = display_df[search_condition]
+    
+    # 浅拷贝：调用方可以替换列用于显示，不影响匹配结果，也不复制数据
+    return display_df.copy(deep=False)
+
+
+def match_status(amounts):
+    """有支付金额即为已匹配"""
+    return pd.Series(np.where(amounts.notna(), '已匹配', '未匹配'), index=amounts.index, dtype=object)
+
+
+def format_amounts(amounts):
+    """支付金额格式化为两位小数的文本，缺失时为空字符串"""
+    amounts = pd.to_numeric(amounts, errors='coerce')
+    return amounts.map('{:.2f}'.format, na_action='ignore').fillna('').astype(object)
+
+
+def customer_display_records(customer_data):
+    """预订人明细：选出显示的列，按日期倒序"""
+    display_data = customer_data[[col for col in CUSTOMER_RECORD_COLUMNS if col in customer_data.columns]]
+    if '日期' in display_data.columns:
+        display_data = display_data.sort_values('日期', ascending=False)
+    return display_data
+
+
+def export_filename(filename_suffix, extension='xlsx'):
+    """带时间戳的导出文件名"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"匹配结果_{filename_suffix}_{timestamp}.{extension}"
+
+
+def _read_source(source):
+    """路径或文件对象读取为bytes，用于计算内容哈希"""
+    if isinstance(source, bytes):
+        return source
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return f.read()
+    return source.getvalue() if hasattr(source, 'getvalue') else source.read()
+
+
+def _dataset_property(name):
+    """会话使用的数据集：从文件加载的按引用保存在 dataset_store 中，多个会话共享一份"""
+    def getter(self):
+        value = self._datasets.get(name)
+        return value.get() if isinstance(value, dataset_store.DatasetRef) else value
+    
+    def setter(self, value):
+        previous = self._datasets.get(name)
+        self._datasets[name] = value
+        # 替换后释放对原共享数据集的引用
+        if isinstance(previous, dataset_store.DatasetRef) and previous is not value:
+            previous.release()
+    
+    return property(getter, setter)
+
+
+def _sort_results(result):
+    """匹配结果按日期、桌牌号、市别排序（稳定排序，同一分区的同一桌保持匹配顺序）
+
+    排序键包含市别：相同的排序键只出现在同一个 (日期, 市别) 分区内，只重新匹配部分
+    分区时结果的行顺序与完整匹配相同。
+    """
+    sort_cols = [col for col in ('日期', '桌牌号', '市别') if col in result.columns]
+    if result.empty or not sort_cols:
+        return result
+    return result.sort_values(sort_cols, ignore_index=True, kind='stable')
+
+
+def _combine_results(reused, rematched, reservation_dtypes):
+    """沿用的分区结果与重新匹配的结果合并后排序
+
+    分类列按本次预订数据的类别还原，列类型与完整匹配相同。
+    """
+    combined = pd.concat([reused, rematched], ignore_index=True)
+    categorical = {
+        col: dtype for col, dtype in reservation_dtypes.items()
+        if isinstance(dtype, pd.CategoricalDtype) and col in combined.columns
+    }
+    return _sort_results(combined.astype(categorical))
+
+
+class ReservationMatcher:
+    """预订记录与美团订单匹配（无界面）"""
+    
+    # 美团订单、预订记录和自动匹配的原始结果只读，可以是 dataset_store 中的共享数据集
+    meituan_file = _dataset_property('meituan')
+    reservation_file = _dataset_property('reservation')
+    original_df = _dataset_property('original')
+    
+    def __init__(self):
+        self._datasets = {}
+        # 匹配结果的数据版本，每次替换 merged_df 时递增；导出文件按版本缓存
+        self.results_version = 0
+        self._export_cache = {}
+        # 导出文件所在的临时目录，会话对象回收时自动删除
+        self._export_dir = None
+        self.meituan_file = None
+        self.reservation_file = None
+        self.merged_df = pd.DataFrame()
+        self.original_df = pd.DataFrame()
+        # 上次匹配的设置和各 (日期, 市别) 分区的内容指纹，用于增量匹配
+        self._match_state = None
+    
+    @property
+    def merged_df(self):
+        """当前会话的匹配结果（只通过 update_results / append_results 修改）"""
+        return self._merged_df
+    
+    @merged_df.setter
+    def merged_df(self, value):
+        self._merged_df = value
+        self.results_version += 1
+        self._clear_export_cache()
+    
+    def load_meituan(self, source):
+        """加载美团订单：DataFrame、文件路径、文件对象或文件内容，无法识别格式时返回None"""
+        if isinstance(source, pd.DataFrame):
+            meituan_df = schema.apply_meituan_schema(source)
+            if meituan_df is not None:
+                self.meituan_file = meituan_df
+            return meituan_df
+        
+        # 从文件加载的数据按内容哈希共享，其他会话已加载过同一文件时不再解析
+        file_bytes = _read_source(source)
+        file_hash = excel_loader.content_hash(file_bytes)
+        meituan_ref = dataset_store.acquire(
+            f"meituan-{file_hash}-v{excel_loader.PARSER_VERSION}",
+            lambda: (excel_loader.load_meituan_upload(file_hash, file_bytes), None)
+        )
+        if meituan_ref is None:
+            return None
+        self.meituan_file = meituan_ref
+        return meituan_ref.get()
+    
+    def load_reservation(self, source, max_workers=None):
+        """加载预订记录，返回 (DataFrame, 有效工作表数, 处理失败的 [(工作表名, 错误信息)])
+        
+        max_workers 为并行解析工作表的进程数，在工作进程中调用时传1避免再启动进程池。
+        """
+        if isinstance(source, pd.DataFrame):
+            reservation_df = schema.apply_reservation_schema(source)
+            self.reservation_file = reservation_df
+            return reservation_df, 1, []
+        
+        def load():
+            reservation_df, valid_sheets, failed_sheets = excel_loader.load_reservation_upload(
+                file_hash, file_bytes, max_workers
+            )
+            return reservation_df, (valid_sheets, failed_sheets)
+        
+        file_bytes = _read_source(source)
+        file_hash = excel_loader.content_hash(file_bytes)
+        reservation_ref = dataset_store.acquire(f"reservation-{file_hash}-v{excel_loader.PARSER_VERSION}", load)
+        self.reservation_file = reservation_ref
+        valid_sheets, failed_sheets = reservation_ref.meta
+        reservation_df = reservation_ref.get()
+        return reservation_df, valid_sheets, failed_sheets
+    
+    def process_new_format_reservation(self, df):
+        """处理新格式的预定表（8月预定.xls格式）"""
+        return excel_loader.process_new_format_reservation(df)
+        
+    def smart_table_match(self, reservation_table, meituan_table):
+        """智能桌牌号匹配函数 - 支持新格式包厢名称"""
+        return match_engine.smart_table_match(reservation_table, meituan_table)
+    
+    def validate_files(self):
+        """验证文件是否已加载"""
+        if self.meituan_file is None or self.reservation_file is None:
+            return False, "请先上传美团订单文件和预订记录文件"
+        
+        if self.meituan_file.empty or self.reservation_file.empty:
+            return False, "上传的文件为空，请检查文件内容"
+        
+        return True, "文件验证通过"
+    
+    def match_data(self, progress_callback=None, max_workers=None,
+                   assignment=match_engine.ASSIGN_ALL, tolerance=match_engine.DEFAULT_TIME_TOLERANCE):
+        """数据匹配核心逻辑 - 使用与桌面版完全相同的匹配算法
+        
+        progress_callback(进度0~1, 阶段说明) 在实际处理的各阶段调用：
+        美团数据预处理、每完成一批 (日期, 市别) 分区的匹配、生成匹配结果。
+        max_workers 为并行匹配的进程数，默认按可用CPU核数，传1时串行匹配。
+        assignment 为 match_engine.ASSIGN_NEAREST 时每条预订只分配预订时间最接近
+        （相差不超过 tolerance）的一条订单，每条订单最多分配给一条预订。
+        
+        再次匹配时（如修改了某天的预订表后重新上传），两侧内容都没有变化的 (日期, 市别)
+        分区直接沿用上次的结果，包括其中的手动匹配和移除操作，只重新匹配有变化的分区。
+        其他会话已用相同设置匹配过同一对文件时，直接使用共享缓存中的结果。
+        """
+        def report(fraction, message):
+            if progress_callback is not None:
+                progress_callback(fraction, message)
+        
+        # 分区匹配占总进度的 15%~90%
+        def report_partition(done, total):
+            report(0.15 + 0.75 * done / total, f"🔍 正在匹配第 {done}/{total} 个分区...")
+        
+        try:
+            report(0.0, "📊 正在预处理美团数据...")
+            # 美团数据预处理 - 加载时已转换为类型化的列，这里只做向量化的筛选和计算
+            mt_df = match_engine.preprocess_orders(self.meituan_file)
+            report(0.15, "📋 正在处理预订记录...")
+            
+            # 读取预订数据
+            merged_all = pd.DataFrame()
+            # 增量匹配时沿用的上次结果
+            reused_merged = None
+            reused_original = None
+            reservation_dtypes = None
+            match_state = None
+            cache_key = None
+            
+            # 处理预订数据 - 支持多工作表
+            if hasattr(self.reservation_file, 'sheet_names'):
+                # 如果是ExcelFile对象，处理多个工作表，各工作表的结果最后一次性合并
+                sheet_results = []
+                sheet_names = self.reservation_file.sheet_names
+                for sheet_index, sheet_name in enumerate(sheet_names, 1):
+                    report_partition(sheet_index, len(sheet_names))
+                    try:
+                        day_df = self.reservation_file.parse(sheet_name)
+                        
+                        # 检查必要的列是否存在（兼容新旧格式）
+                        # 新格式：姓名、预订人
+                        # 旧格式：姓名、预订人 或 客户姓名、预订人
+                        has_name_col = '姓名' in day_df.columns or '客户姓名' in day_df.columns
+                        has_booker_col = '预订人' in day_df.columns
+                        
+                        if not (has_name_col and has_booker_col):
+                            continue
+                            
+                        # 数据清洗（兼容新旧格式）
+                        name_col = '姓名' if '姓名' in day_df.columns else '客户姓名'
+                        day_df = day_df[day_df[name_col].notna() & day_df['预订人'].notna()]
+                        
+                        # 预订人姓名标准化处理
+                        def standardize_name(name):
+                            if pd.isna(name):
+                                return name
+                            name_str = str(name).strip()
+                            # 处理同义词
+                            if name_str in ['平和', '平哥']:
+                                return '平和'
+                            # 处理刘霞和刘的映射
+                            if name_str in ['刘霞', '刘']:
+                                return '刘霞'
+                            # 处理周和周思玗的映射
+                            if name_str in ['周', '周思玗']:
+                                return '周思玗'
+                            # 处理大小写统一（sk -> SK）
+                            if name_str.lower() == 'sk':
+                                return 'SK'
+                            return name_str
+                        
+                        day_df['预订人'] = day_df['预订人'].apply(standardize_name)
+                        
+                        # 选择和重命名列（兼容新旧格式）
+                        # 新格式可能的列：日期、市别、包厢、姓名、预订人、人数、时间、客户类型
+                        # 旧格式可能的列：日期、市别、包厢、客户姓名、预订人、经手人
+                        available_cols = ['日期', '市别', '包厢', '姓名', '客户姓名', '预订人', '经手人', '人数', '时间', '客户类型']
+                        existing_cols = [col for col in available_cols if col in day_df.columns]
+                        day_df = day_df[existing_cols].copy(deep=False)
+                        
+                        # 标准化列名（统一为旧格式的列名以保持兼容性）
+                        col_mapping = {
+                            '包厢': '桌牌号', 
+                            '姓名': '客户姓名',  # 新格式的姓名映射为客户姓名
+                            '客户姓名': '客户姓名'  # 旧格式保持不变
+                        }
+                        day_df.rename(columns=col_mapping, inplace=True)
+                        
+                        # 处理日期
+                        if '日期' in day_df.columns:
+                            day_df['日期'] = schema.parse_reservation_dates(day_df['日期'])
+                        
+                        # 合并数据 - 按 (日期, 市别, 桌牌键) 批量匹配
+                        if '日期' in day_df.columns and '桌牌号' in day_df.columns and '市别' in day_df.columns:
+                            merged = match_engine.match_reservations(
+                                day_df, mt_df, max_workers=max_workers,
+                                assignment=assignment, tolerance=tolerance
+                            )
+                            if not merged.empty:
+                                sheet_results.append(merged)
+                                
+                    except Exception as e:
+                        continue
+                if sheet_results:
+                    merged_all = pd.concat(sheet_results, ignore_index=True)
+            else:
+                # 如果是单个DataFrame，直接处理
+                day_df = schema.apply_reservation_schema(self.reservation_file)
+                
+                # 检查必要的列是否存在 - 兼容新旧格式
+                name_col = None
+                if '姓名' in day_df.columns:
+                    name_col = '姓名'
+                elif '客户姓名' in day_df.columns:
+                    name_col = '客户姓名'
+                
+                if name_col is None or '预订人' not in day_df.columns:
+                    return False, f"预订文件缺少必要列: 需要'姓名'或'客户姓名'列以及'预订人'列"
+                    
+                # 数据清洗
+                day_df = day_df[day_df[name_col].notna() & day_df['预订人'].notna()]
+                
+                # 选择和重命名列 - 兼容新旧格式
+                available_cols = ['日期', '市别', '包厢', '桌牌号', name_col, '预订人', '经手人', '预订时间', '时间']
+                existing_cols = [col for col in available_cols if col in day_df.columns]
+                day_df = day_df[existing_cols].copy(deep=False)
+                
+                # 标准化列名 - 统一映射到旧格式列名
+                col_mapping = {
+                    '包厢': '桌牌号',
+                    '姓名': '客户姓名'  # 新格式的'姓名'映射为'客户姓名'
+                }
+                # 如果已经是'客户姓名'列，则不需要重命名
+                if name_col == '客户姓名':
+                    col_mapping.pop('姓名', None)
+                    
+                day_df.rename(columns=col_mapping, inplace=True)
+                
+                # 处理日期
+                if '日期' in day_df.columns:
+                    day_df['日期'] = schema.parse_reservation_dates(day_df['日期'])
+                
+                # 合并数据 - 按 (日期, 市别, 桌牌键) 批量匹配
+                if '日期' in day_df.columns and '桌牌号' in day_df.columns and '市别' in day_df.columns:
+                    # 只重新匹配内容有变化的分区
+                    match_state = {
+                        'settings': (assignment, tolerance, tuple(day_df.columns), tuple(mt_df.columns)),
+                        'fingerprints': match_engine.partition_fingerprints(day_df, mt_df),
+                    }
+                    unchanged = self._unchanged_partitions(match_state)
+                    # 本会话没有可沿用的结果时先查共享缓存；有可沿用的分区时增量匹配，
+                    # 保留这些分区中本会话的手动匹配和移除操作
+                    if not unchanged:
+                        cache_key = self._result_cache_key(assignment, tolerance)
+                    cached_ref = None
+                    if cache_key:
+                        # 内存中的结果只由 dataset_store 保存，不在其中时从磁盘缓存读入
+                        cached_ref = dataset_store.acquire(
+                            f"result-{cache_key}", lambda: (result_cache.get(cache_key), None)
+                        )
+                    if cached_ref is not None:
+                        # 缓存中的结果为共享对象，原始结果只读，可修改的结果使用副本
+                        self.original_df = cached_ref
+                        self.merged_df = cached_ref.get().copy(deep=False)
+                        self._match_state = match_state
+                        report(1.0, "🎉 匹配完成！")
+                        return True, self._match_summary() + "（使用已缓存的匹配结果）"
+                    if unchanged:
+                        reservation_dtypes = day_df.dtypes
+                        reused_merged = self._partition_rows(self.merged_df, unchanged)
+                        reused_original = self._partition_rows(self.original_df, unchanged)
+                        day_df = day_df[~match_engine.partition_labels(day_df['日期'], day_df['市别']).isin(unchanged)]
+                        mt_df = mt_df[~match_engine.partition_labels(mt_df['下单时间'], mt_df['市别']).isin(unchanged)]
+                    merged_all = match_engine.match_reservations(
+                        day_df, mt_df, progress_callback=report_partition, max_workers=max_workers,
+                        assignment=assignment, tolerance=tolerance
+                    )
+            
+            report(0.9, "✨ 正在生成匹配结果...")
+            # 数据后处理
+            if not merged_all.empty:
+                # 添加匹配状态列
+                merged_all['匹配状态'] = match_status(merged_all['支付合计'])
+                
+                # 格式化数据
+                if '支付合计' in merged_all.columns:
+                    merged_all['支付合计'] = format_amounts(merged_all['支付合计'])
+            
+            if reused_merged is not None:
+                original_all = _combine_results(reused_original, merged_all, reservation_dtypes)
+                merged_all = _combine_results(reused_merged, merged_all, reservation_dtypes)
+            else:
+                # 保存原始数据：与匹配结果共用列数据，匹配结果只通过 update_results 按列替换修改
+                merged_all = _sort_results(merged_all)
+                original_all = merged_all.copy(deep=False)
+            
+            self.merged_df = merged_all
+            self.original_df = original_all
+            self._match_state = match_state
+            # 只缓存完整匹配的结果；原始结果之后不再原地修改，可直接共享
+            if cache_key and reused_merged is None:
+                result_cache.put(cache_key, original_all)
+                self.original_df = dataset_store.acquire(f"result-{cache_key}", lambda: (original_all, None))
+            report(1.0, "🎉 匹配完成！")
+            
+            message = self._match_summary()
+            if reused_merged is not None:
+                message += f"（{len(unchanged)} 个日期/市别分区未变化，沿用上次结果）"
+            return True, message
+            
+        except Exception as e:
+            return False, f"匹配失败: {str(e)}"
+    
+    def _match_summary(self):
+        """匹配结果的统计信息"""
+        total_records = len(self.merged_df)
+        matched_records = len(self.merged_df[self.merged_df['匹配状态'] == '已匹配']) if '匹配状态' in self.merged_df.columns else 0
+        return f"匹配完成！总记录: {total_records}, 已匹配: {matched_records}, 未匹配: {total_records - matched_records}"
+    
+    def _result_cache_key(self, assignment, tolerance):
+        """共享匹配结果缓存的键；数据不是从文件加载的共享数据集时返回None"""
+        dataset_keys = []
+        for name in ('meituan', 'reservation'):
+            value = self._datasets.get(name)
+            if not isinstance(value, dataset_store.DatasetRef):
+                return None
+            # 数据集键包含文件内容哈希和解析器版本
+            dataset_keys.append(value.key)
+        return result_cache.result_key(
+            dataset_keys[0], dataset_keys[1], match_engine.MATCH_RULE_VERSION, (assignment, tolerance)
+        )
+    
+    def _unchanged_partitions(self, match_state):
+        """与上次匹配相比两侧内容都未变化的分区标签，无法增量匹配时返回空集合"""
+        previous = self._match_state
+        if previous is None or previous['settings'] != match_state['settings'] or self.merged_df.empty:
+            return set()
+        return {
+            label for label, fingerprint in match_state['fingerprints'].items()
+            if previous['fingerprints'].get(label) == fingerprint
+        }
+    
+    def _partition_rows(self, result_df, partitions):
+        """结果中属于指定分区的记录"""
+        if result_df.empty:
+            return result_df
+        labels = match_engine.partition_labels(result_df['日期'], result_df['市别'])
+        return result_df[labels.isin(partitions)]
+    
+    def remove_match(self, selected_record):
+        """移除匹配记录，清空对应预订记录的订单信息"""
+        # 在merged_df中找到对应记录并移除匹配信息
+        mask = (
+            (self.merged_df['日期'] == selected_record['日期']) &
+            (self.merged_df['桌牌号'] == selected_record['桌牌号']) &
+            (self.merged_df['预订人'] == selected_record['预订人']) &
+            (self.merged_df['市别'] == selected_record['市别'])
+        )
+        
+        # 更新匹配状态和相关字段
+        self.update_results(mask, {
+            '匹配状态': '未匹配',
+            '匹配类型': '未匹配',
+            '支付合计': None,
+            '下单时间': None,
+            '下单时间_格式化': None,
+            '结账方式': None,
+        })
+    
+    def add_manual_matches(self, reservation_idx, meituan_records):
+        """手动把预订记录匹配到选中的美团订单
+        
+        第一个订单更新原预订记录，其余订单各追加一条匹配记录。
+        """
+        if meituan_records.empty:
+            return
+        orders = meituan_records.reset_index(drop=True)
+        
+        # 每个选中的订单对应一条预订记录：按位置一次take出重复的预订行，再整列写入订单字段
+        position = self.merged_df.index.get_loc(reservation_idx)
+        new_rows = self.merged_df.take(np.repeat(position, len(orders))).reset_index(drop=True)
+        order_times = pd.to_datetime(orders['下单时间'], errors='coerce') if '下单时间' in orders.columns \
+            else pd.Series(pd.NaT, index=orders.index)
+        updates = {
+            '匹配状态': '已匹配',
+            '匹配类型': MANUAL_MATCH_TYPE,
+            '下单时间': order_times,
+            '下单时间_格式化': match_engine.format_clock_times(order_times),
+        }
+        if '结账方式' in orders.columns:
+            updates['结账方式'] = orders['结账方式'].astype(object)
+        if '支付合计' in orders.columns:
+            updates['支付合计'] = format_amounts(orders['支付合计'])
+        new_rows = new_rows.assign(**updates)
+        
+        # 第一个订单更新原记录，其余订单追加为新记录；其他列与原记录相同，只更新订单字段
+        first_row = new_rows.iloc[0]
+        self.update_results([reservation_idx], {col: first_row[col] for col in updates})
+        if len(new_rows) > 1:
+            self.append_results(new_rows.iloc[1:])
+    
+    def update_results(self, rows, values):
+        """修改匹配结果：rows 为行标签列表或布尔掩码，values 为 {列名: 新值}
+        
+        匹配结果与共享的原始结果共用列数据，修改时只复制并替换涉及的列（写时复制），
+        不能直接对 merged_df 做 .loc/.at 赋值。
+        """
+        merged_df = self.merged_df.copy(deep=False)
+        for col, value in values.items():
+            if col in merged_df.columns:
+                column = merged_df[col].copy()
+            else:
+                column = pd.Series(np.nan, index=merged_df.index, dtype=object)
+            column.loc[rows] = value
+            merged_df[col] = column
+        self.merged_df = merged_df
+    
+    def append_results(self, records):
+        """在匹配结果末尾追加记录"""
+        self.merged_df = pd.concat([self.merged_df, records], ignore_index=True)
+    
+    def filter_results(self, filter_option="全部记录", search_keyword=""):
+        """按匹配状态和预订人筛选匹配结果"""
+        return filter_results(self.merged_df, filter_option, search_keyword)
+    
+    def prepare_export(self, export_option="全部（按时间排列）", filter_option="全部记录", search_keyword=""):
+        """整理要导出的匹配成功记录，返回 (导出DataFrame, 文件名后缀)"""
+        # 准备导出数据
+        if export_option == "仅搜索":
+            # 获取当前显示的搜索结果（只包含匹配成功的）
+            export_df = self.filter_results(filter_option, search_keyword)
+            export_df = export_df[export_df['匹配状态'] == '已匹配']  # 只导出匹配成功的
+            
+            # 根据搜索关键词生成文件名
+            if search_keyword.strip():
+                filename_suffix = f"{search_keyword.strip()}（美团匹配清单）"
+            else:
+                filename_suffix = "搜索结果"
+        else:
+            # 全部匹配成功的数据，按时间排列
+            export_df = self.merged_df[self.merged_df['匹配状态'] == '已匹配']
+            if '日期' in export_df.columns:
+                export_df = export_df.sort_values('日期')
+            filename_suffix = "全部匹配"
+        
+        # 检查并选择可用的列
+        available_columns = []
+        for col in EXPORT_COLUMNS:
+            if col in export_df.columns:
+                available_columns.append(col)
+            elif col == '预订人' and '客户姓名' in export_df.columns:
+                available_columns.append('客户姓名')
+                export_df = export_df.rename(columns={'客户姓名': '预订人'})
+        
+        # 创建导出用的DataFrame
+        final_export_df = export_df[available_columns]
+        
+        # 按日期排序（如果有下单时间列）
+        if '下单时间' in final_export_df.columns:
+            final_export_df = final_export_df.sort_values('下单时间')
+        
+        return final_export_df, filename_suffix
+    
+    def export_file(self, export_option="全部（按时间排列）", filter_option="全部记录", search_keyword="",
+                    file_format='xlsx'):
+        """生成导出的临时文件，返回 (文件路径, 文件名, 记录数)，没有匹配成功的数据时返回None
+        
+        file_format 为 FILE_FORMAT_OPTIONS 中的格式：Excel逐批写入磁盘，内存占用与导出行数无关；
+        CSV、Parquet和JSON Lines中支付合计为数值、下单时间为日期时间。
+        按匹配结果的数据版本和导出条件缓存，结果未修改时直接返回上次生成的文件。
+        """
+        key = self._export_key(export_option, filter_option, search_keyword, file_format)
+        if key not in self._export_cache:
+            final_export_df, filename_suffix = self.prepare_export(export_option, filter_option, search_keyword)
+            if final_export_df.empty:
+                self._export_cache[key] = None
+            else:
+                if self._export_dir is None:
+                    self._export_dir = tempfile.TemporaryDirectory(prefix='matcher_export_')
+                path = exporter.match_results_file(final_export_df, self._export_dir.name, file_format)
+                self._export_cache[key] = (path, filename_suffix, len(final_export_df))
+        return self._with_filename(self._export_cache[key])
+    
+    def cached_export(self, export_option="全部（按时间排列）", filter_option="全部记录", search_keyword="",
+                      file_format='xlsx'):
+        """已生成的导出文件，返回 (是否已生成, export_file 的返回值)，不会生成新文件"""
+        key = self._export_key(export_option, filter_option, search_keyword, file_format)
+        if key not in self._export_cache:
+            return False, None
+        return True, self._with_filename(self._export_cache[key])
+    
+    def _export_key(self, export_option, filter_option, search_keyword, file_format):
+        # 全部导出与筛选条件无关
+        if export_option != "仅搜索":
+            return export_option, file_format, self.results_version
+        return export_option, file_format, self.results_version, filter_option, search_keyword.strip()
+    
+    def _clear_export_cache(self):
+        """匹配结果变化后删除已生成的导出文件"""
+        for exported in self._export_cache.values():
+            if exported is not None:
+                exported[0].unlink(missing_ok=True)
+        self._export_cache = {}
+    
+    @staticmethod
+    def _with_filename(exported):
+        # 文件名带生成时间，每次取用时重新生成
+        if exported is None:
+            return None
+        path, filename_suffix, record_count = exported
+        return path, export_filename(filename_suffix, path.suffix.lstrip('.')), record_count
+    
+    def normalize_customer_name(self, name):
+        """标准化预订人姓名"""
+        if pd.isna(name) or str(name).strip() == '':
+            return None
+        
+        name = str(name).strip()
+        
+        # 转换为小写进行比较
+        name_lower = name.lower()
+        
+        # 定义姓名映射规则
+        name_mappings = {
+            'sk': 'SK',  # sk -> SK
+            '平': '平哥',  # 平 -> 平哥
+            '平哥': '平哥',  # 平哥保持不变
+            '周': '周',  # 周保持不变
+        }
+        
+        # 检查是否需要映射
+        for key, value in name_mappings.items():
+            if name_lower == key.lower():
+                return value
+        
+        # 如果没有特殊映射，返回原始名称（保持原有大小写）
+        return name
+    
+    def standardized_customer_names(self):
+        """每条记录的标准化预订人姓名，每个不同的姓名只标准化一次"""
+        codes, names = pd.factorize(self.merged_df['预订人'])
+        # 缺失值的编码为-1，对应末尾的None
+        standardized = np.array([self.normalize_customer_name(name) for name in names] + [None], dtype=object)
+        return pd.Series(standardized[codes], index=self.merged_df.index)
+    
+    def get_standardized_customers(self):
+        """获取标准化后的预订人列表"""
+        if '预订人' not in self.merged_df.columns:
+            return []
+        
+        # 标准化所有预订人姓名
+        standardized_names = self.standardized_customer_names().dropna().unique()
+        
+        return sorted([name for name in standardized_names if name])
+    
+    def customer_records(self, customer_name):
+        """按标准化姓名筛选某个预订人的全部记录"""
+        return self.merged_df[self.standardized_customer_names() == customer_name]
+    
+    def customer_groups(self):
+        """按标准化姓名把匹配结果一次分组，返回 {预订人: 明细DataFrame}，按姓名排序"""
+        if '预订人' not in self.merged_df.columns or self.merged_df.empty:
+            return {}
+        groups = self.merged_df.groupby(self.standardized_customer_names(), sort=True)
+        return {name: customer_display_records(group) for name, group in groups}
+    
+    def export_customer_archive(self, single_workbook=False, max_workers=None):
+        """所有预订人的明细打包为zip临时文件，返回 (文件路径, 文件名, 预订人数)，没有预订人时返回None
+        
+        默认每人一个工作簿（记录较多时并行生成），single_workbook 为True时放在一个多工作表的工作簿中。
+        与其他导出一样按数据版本缓存。
+        """
+        key = self._customer_archive_key(single_workbook)
+        if key not in self._export_cache:
+            customer_frames = self.customer_groups()
+            if not customer_frames:
+                self._export_cache[key] = None
+            else:
+                if self._export_dir is None:
+                    self._export_dir = tempfile.TemporaryDirectory(prefix='matcher_export_')
+                fd, path = tempfile.mkstemp(suffix='.zip', prefix='预订人明细_', dir=self._export_dir.name)
+                os.close(fd)
+                path = Path(path)
+                try:
+                    customer_count = exporter.write_customer_archive(
+                        customer_frames, path, single_workbook, max_workers
+                    )
+                except Exception:
+                    path.unlink(missing_ok=True)
+                    raise
+                self._export_cache[key] = (path, '预订人明细', customer_count)
+        return self._with_filename(self._export_cache[key])
+    
+    def cached_customer_archive(self, single_workbook=False):
+        """已生成的预订人明细压缩包，返回 (是否已生成, export_customer_archive 的返回值)"""
+        key = self._customer_archive_key(single_workbook)
+        if key not in self._export_cache:
+            return False, None
+        return True, self._with_filename(self._export_cache[key])
+    
+    def _customer_archive_key(self, single_workbook):
+        return '预订人明细', single_workbook, self.results_version
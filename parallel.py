@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+进程池相关的公共工具
+"""
+
+import math
+import os
+
+
+def available_cpu_count():
+    """当前进程可用的CPU核数，考虑容器的cgroup配额和CPU亲和性"""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # Windows / macOS 不支持 sched_getaffinity
+        count = os.cpu_count() or 1
+
+    # cgroup v2: "<quota> <period>"，不限额时quota为"max"
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            count = min(count, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+
+    return max(1, count)
+
+
+def resolve_worker_count(max_workers, task_count):
+    """确定进程池大小：未指定时按可用核数，且不超过任务数"""
+    workers = max_workers or available_cpu_count()
+    return max(1, min(workers, task_count))
+
+
+def split_chunks(items, chunk_count):
+    """按原顺序把列表切成chunk_count段连续的块"""
+    items = list(items)
+    if not items:
+        return []
+    size = math.ceil(len(items) / chunk_count)
+    return [items[i:i + size] for i in range(0, len(items), size)]
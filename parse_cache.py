@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+解析结果的磁盘缓存
+
+解析并清理后的上传文件以Parquet列式格式保存在数据目录下，
+按 (文件类型, 内容哈希, 解析器版本) 命名。同一份文件再次上传或在其他会话中打开时，
+直接读取列式文件，不再经过openpyxl/xlrd解析Excel。
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 数据目录，docker-compose 中挂载为 ./data:/app/data
+DATA_DIR = Path(os.environ.get('MATCHER_DATA_DIR', Path(__file__).parent / 'data'))
+PARSE_CACHE_DIR = DATA_DIR / 'parse_cache'
+
+
+def _cache_paths(kind, file_hash, parser_version):
+    stem = f"{kind}-{file_hash}-v{parser_version}"
+    return PARSE_CACHE_DIR / f"{stem}.parquet", PARSE_CACHE_DIR / f"{stem}.json"
+
+
+def read_frame(data_path):
+    """读取Parquet文件，文本列中的缺失值统一还原为NaN"""
+    df = pd.read_parquet(data_path)
+    # Parquet把文本列中的缺失值读回为None，统一还原为NaN
+    for col in df.columns[df.dtypes == 'object']:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+def write_files(df, data_path, meta_path=None, meta=None):
+    """先写临时文件再替换，避免其他会话读到写了一半的文件；失败时抛出异常并清理临时文件"""
+    tmp_data_path = data_path.with_name(f"{data_path.name}.{os.getpid()}.tmp")
+    tmp_meta_path = meta_path.with_name(f"{meta_path.name}.{os.getpid()}.tmp") if meta_path else None
+    try:
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        if meta_path is not None:
+            tmp_meta_path.write_text(json.dumps(meta or {}, ensure_ascii=False), encoding='utf-8')
+            os.replace(tmp_meta_path, meta_path)
+        df.to_parquet(tmp_data_path)
+        os.replace(tmp_data_path, data_path)
+    except Exception:
+        for path in (tmp_data_path, tmp_meta_path):
+            try:
+                if path is not None:
+                    path.unlink()
+            except OSError:
+                pass
+        raise
+
+
+def load(kind, file_hash, parser_version):
+    """读取缓存，返回 (DataFrame, 附加信息字典)，未命中或读取失败时返回None"""
+    data_path, meta_path = _cache_paths(kind, file_hash, parser_version)
+    if not data_path.exists():
+        return None
+    try:
+        df = read_frame(data_path)
+        meta = json.loads(meta_path.read_text(encoding='utf-8')) if meta_path.exists() else {}
+    except Exception:
+        # 缓存文件损坏或缺少pyarrow时按未命中处理
+        return None
+    return df, meta
+
+
+def save(kind, file_hash, parser_version, df, meta=None):
+    """写入缓存，失败时静默跳过（缓存只用于加速，不影响正常解析）"""
+    data_path, meta_path = _cache_paths(kind, file_hash, parser_version)
+    try:
+        write_files(df, data_path, meta_path, meta)
+    except Exception:
+        pass
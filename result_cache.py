@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+匹配结果缓存
+
+按 (美团文件内容哈希, 预订文件内容哈希, 匹配规则版本, 匹配设置) 缓存自动匹配的结果，
+以Parquet文件保存在数据目录下。浏览器刷新、新开标签页或其他同事打开同一对文件时
+直接取用结果，不再重新匹配。磁盘有容量上限，超出时按最近最少使用淘汰；读入内存的
+结果由 dataset_store 统一管理，与解析结果共用一个内存上限。
+手动匹配和移除操作只属于各自的会话，不写入共享缓存。
+"""
+
+import hashlib
+import os
+
+import parse_cache
+
+RESULT_CACHE_DIR = parse_cache.DATA_DIR / 'result_cache'
+# 磁盘缓存的容量上限（MB）
+DISK_BUDGET = int(os.environ.get('MATCHER_RESULT_DISK_MB', 1024)) * 1024 * 1024
+
+
+def result_key(meituan_hash, reservation_hash, rule_version, settings):
+    """匹配结果的缓存键"""
+    parts = [meituan_hash, reservation_hash, f"r{rule_version}"] + [str(value) for value in settings]
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _data_path(key):
+    return RESULT_CACHE_DIR / f"{key}.parquet"
+
+
+def get(key):
+    """读取缓存的匹配结果，未命中时返回None"""
+    data_path = _data_path(key)
+    if not data_path.exists():
+        return None
+    try:
+        df = parse_cache.read_frame(data_path)
+        # 更新修改时间，磁盘淘汰时按修改时间判断最近使用
+        os.utime(data_path)
+    except Exception:
+        return None
+    return df
+
+
+def put(key, df):
+    """写入磁盘缓存，写入失败时静默跳过"""
+    try:
+        parse_cache.write_files(df, _data_path(key))
+    except Exception:
+        return
+    _evict_disk()
+
+
+def _evict_disk():
+    """磁盘缓存超出上限时删除最久未使用的文件"""
+    try:
+        entries = [(path.stat().st_mtime, path.stat().st_size, path) for path in RESULT_CACHE_DIR.glob('*.parquet')]
+    except OSError:
+        return
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= DISK_BUDGET:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total -= size
+
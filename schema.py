@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+上传数据的类型化列定义
+
+解析后的数据按列转换为紧凑的类型：重复值多的文本列用分类类型，日期时间列用datetime64，
+金额列用浮点数，其余文本列保留为字符串并保留缺失值（不再把NaN变成字符串'nan'）。
+转换是幂等的，已经是目标类型的列直接跳过，后续处理可以反复调用而不会重新解析。
+"""
+
+import pandas as pd
+
+# 美团订单列类型
+MEITUAN_CATEGORY_COLUMNS = ['桌牌号', '订单状态']
+MEITUAN_DATETIME_COLUMNS = ['营业日期', '下单时间']
+MEITUAN_FLOAT_COLUMNS = ['支付合计']
+
+# 预订记录列类型（新格式的'包厢'在匹配时映射为'桌牌号'）
+RESERVATION_CATEGORY_COLUMNS = ['包厢', '桌牌号', '市别', '预订人']
+RESERVATION_DATE_COLUMNS = ['日期']
+
+
+def to_category(series):
+    """文本转为分类类型，非字符串的值按字符串处理，缺失值保持缺失"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    return series.map(str, na_action='ignore').astype('category')
+
+
+def to_datetime(series):
+    """转为datetime64，无法解析的值（如'--'）记为NaT"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return pd.to_datetime(series, errors='coerce')
+
+
+def to_float(series):
+    """转为浮点数，无法解析的值记为NaN"""
+    if pd.api.types.is_float_dtype(series):
+        return series
+    return pd.to_numeric(series, errors='coerce').astype(float)
+
+
+def to_text(series):
+    """混合类型的object列统一为字符串，缺失值保持缺失"""
+    if series.dtype != 'object':
+        return series
+    return series.map(str, na_action='ignore')
+
+
+def parse_reservation_dates(series):
+    """预订日期只保留日期部分
+
+    单元格可能是日期时间，也可能是"2025-08-01 星期五"这样的文本，
+    文本取第一个空格前的部分解析。
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.normalize()
+    return pd.to_datetime(series.astype(str).str.split().str[0], errors='coerce')
+
+
+def _apply(df, conversions):
+    df = df.copy(deep=False)
+    for col in df.columns:
+        df[col] = conversions.get(col, to_text)(df[col])
+    return df
+
+
+def apply_meituan_schema(df):
+    """美团订单列类型转换"""
+    conversions = {}
+    conversions.update({col: to_category for col in MEITUAN_CATEGORY_COLUMNS})
+    conversions.update({col: to_datetime for col in MEITUAN_DATETIME_COLUMNS})
+    conversions.update({col: to_float for col in MEITUAN_FLOAT_COLUMNS})
+    return _apply(df, conversions)
+
+
+def apply_reservation_schema(df):
+    """预订记录列类型转换"""
+    conversions = {}
+    conversions.update({col: to_category for col in RESERVATION_CATEGORY_COLUMNS})
+    conversions.update({col: parse_reservation_dates for col in RESERVATION_DATE_COLUMNS})
+    return _apply(df, conversions)
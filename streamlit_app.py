@@ -1,177 +1,18 @@
 import streamlit as st
 import pandas as pd
-import re
 import os
 from datetime import datetime
-import io
 import plotly.express as px
 import plotly.graph_objects as go
 from collections import Counter
 
-class ReservationMatcherWeb:
-    def __init__(self):
-        self.meituan_file = None
-        self.reservation_file = None
-        self.merged_df = pd.DataFrame()
-        self.original_df = pd.DataFrame()
-    
-    def process_new_format_reservation(self, df):
-        """处理新格式的预定表（8月预定.xls格式）"""
-        if df.empty:
-            return df
-            
-        # 检测是否为新格式：第一行包含'包厢'和日期信息，且有很多Unnamed列
-        first_row = df.iloc[0] if len(df) > 0 else pd.Series()
-        unnamed_cols = [col for col in df.columns if 'Unnamed' in str(col)]
-        
-        # 新格式特征：第一行有'包厢'，且有多个Unnamed列
-        is_new_format = (
-            len(unnamed_cols) >= 5 and 
-            len(df) > 0 and 
-            pd.notna(first_row.iloc[0]) and 
-            str(first_row.iloc[0]) == '包厢'
-        )
-        
-        if is_new_format:
-            # 处理新格式
-            # 跳过第0行（表头行），从第1行开始读取数据
-            data_df = df.iloc[1:].copy()
-            
-            # 重新定义列名
-            new_columns = {
-                0: '包厢',
-                1: '市别', 
-                2: '预订时间',
-                3: '姓名',
-                4: '人数',
-                5: '联系电话',
-                6: '预订人',
-                7: '经手人',
-                8: '备注'
-            }
-            
-            # 重命名列
-            column_mapping = {}
-            for i, col in enumerate(data_df.columns):
-                if i in new_columns:
-                    column_mapping[col] = new_columns[i]
-            
-            data_df = data_df.rename(columns=column_mapping)
-            
-            # 过滤掉空行和无效数据
-            data_df = data_df[data_df['包厢'].notna()]
-            data_df = data_df[data_df['包厢'] != '晚市']  # 过滤掉分隔行
-            
-            # 过滤掉总结行（包含"合计"的行）
-            data_df = data_df[~data_df['包厢'].astype(str).str.contains('合计', na=False)]
-            data_df = data_df[~data_df['包厢'].astype(str).str.contains('总计', na=False)]
-            data_df = data_df[~data_df['包厢'].astype(str).str.contains('小计', na=False)]
-            
-            # 从表头行提取日期信息
-            header_info = first_row.iloc[1] if len(first_row) > 1 else None
-            if pd.notna(header_info) and '月' in str(header_info):
-                # 解析日期信息，如"8月1号 星期五"
-                date_str = str(header_info)
-                try:
-                    # 提取月份和日期
-                    import re
-                    match = re.search(r'(\d+)月(\d+)号', date_str)
-                    if match:
-                        month = int(match.group(1))
-                        day = int(match.group(2))
-                        # 假设是当前年份
-                        current_year = datetime.now().year
-                        date_obj = datetime(current_year, month, day)
-                        data_df['日期'] = date_obj
-                except:
-                    # 如果解析失败，使用当前日期
-                    data_df['日期'] = datetime.now().date()
-            else:
-                data_df['日期'] = datetime.now().date()
-            
-            # 处理预订时间字段（新格式中可能是time对象）
-            if '预订时间' in data_df.columns:
-                def convert_time_format(time_val):
-                    if pd.isna(time_val):
-                        return None
-                    try:
-                        # 如果是time对象，转换为字符串
-                        if hasattr(time_val, 'strftime'):
-                            return time_val.strftime('%H:%M')
-                        # 如果是字符串，直接返回
-                        elif isinstance(time_val, str):
-                            return time_val
-                        # 其他情况转换为字符串
-                        else:
-                            return str(time_val)
-                    except:
-                        return str(time_val) if time_val is not None else None
-                
-                data_df['预订时间'] = data_df['预订时间'].apply(convert_time_format)
-            
-            return data_df
-        else:
-            # 原格式，直接返回
-            return df
-        
-    def smart_table_match(self, reservation_table, meituan_table):
-        """智能桌牌号匹配函数 - 支持新格式包厢名称"""
-        # 提取数字部分
-        def extract_numbers(table_str):
-            if pd.isna(table_str):
-                return None
-            numbers = re.findall(r'\d+', str(table_str))
-            return ''.join(numbers) if numbers else None
-        
-        # 提取包厢名称关键词
-        def extract_room_keywords(table_str):
-            if pd.isna(table_str):
-                return set()
-            table_str = str(table_str).lower()
-            # 新格式包厢关键词
-            room_keywords = ['福禄', '喜乐', '大厅', '包厢', '雅间']
-            found_keywords = set()
-            for keyword in room_keywords:
-                if keyword in table_str:
-                    found_keywords.add(keyword)
-            return found_keywords
-        
-        # 判断是否为外卖订单
-        def is_takeout(table_str):
-            if pd.isna(table_str):
-                return False
-            table_str = str(table_str).lower()
-            takeout_keywords = ['外卖', 'takeout', '配送', '打包']
-            return any(keyword in table_str for keyword in takeout_keywords)
-        
-        # 完全匹配（最高优先级）
-        if str(reservation_table) == str(meituan_table):
-            return True, "完全匹配"
-        
-        # 包厢名称 + 数字匹配（新格式支持）
-        res_keywords = extract_room_keywords(reservation_table)
-        mt_keywords = extract_room_keywords(meituan_table)
-        res_numbers = extract_numbers(reservation_table)
-        mt_numbers = extract_numbers(meituan_table)
-        
-        # 如果包厢关键词和数字都匹配
-        if (res_keywords and mt_keywords and 
-            res_keywords.intersection(mt_keywords) and 
-            res_numbers and mt_numbers and res_numbers == mt_numbers):
-            if is_takeout(meituan_table):
-                return True, "包厢外卖匹配"
-            else:
-                return True, "包厢匹配"
-        
-        # 数字部分匹配（传统匹配方式）
-        if res_numbers and mt_numbers and res_numbers == mt_numbers:
-            # 区分外卖和堂食的数字匹配
-            if is_takeout(meituan_table):
-                return True, "外卖匹配"
-            else:
-                return True, "数字匹配"
-        
-        return False, "无匹配"
+import exporter
+import match_engine
+import matcher_core
+
+
+class ReservationMatcherWeb(matcher_core.ReservationMatcher):
+    """Streamlit界面，加载、匹配、筛选和导出由 matcher_core.ReservationMatcher 完成"""
     
     def show_record_details(self, selected_record, display_df, selected_idx):
         """显示选中记录的详细信息"""
@@ -220,22 +61,7 @@ class ReservationMatcherWeb:
     def remove_match(self, selected_record, selected_idx):
         """移除匹配记录"""
         try:
-            # 在merged_df中找到对应记录并移除匹配信息
-            mask = (
-                (self.merged_df['日期'] == selected_record['日期']) &
-                (self.merged_df['桌牌号'] == selected_record['桌牌号']) &
-                (self.merged_df['预订人'] == selected_record['预订人']) &
-                (self.merged_df['市别'] == selected_record['市别'])
-            )
-            
-            # 更新匹配状态和相关字段
-            self.merged_df.loc[mask, '匹配状态'] = '未匹配'
-            self.merged_df.loc[mask, '匹配类型'] = '未匹配'
-            self.merged_df.loc[mask, '支付合计'] = None
-            self.merged_df.loc[mask, '下单时间'] = None
-            self.merged_df.loc[mask, '下单时间_格式化'] = None
-            self.merged_df.loc[mask, '结账方式'] = None
-            
+            super().remove_match(selected_record)
             st.success("✅ 已成功移除匹配")
             
         except Exception as e:
@@ -268,33 +94,12 @@ class ReservationMatcherWeb:
         
         if meituan_uploaded:
             try:
-                # 尝试不同的header设置来读取美团文件
-                meituan_df = None
-                for header_row in [2, 1, 0, None]:
-                    try:
-                        temp_df = pd.read_excel(meituan_uploaded, header=header_row)
-                        # 检查是否包含关键列
-                        if any('营业日期' in str(col) for col in temp_df.columns) and \
-                           any('桌牌号' in str(col) for col in temp_df.columns):
-                            meituan_df = temp_df
-                            break
-                    except:
-                        continue
+                # 解析结果按文件内容哈希在各会话间共享，页面重新运行时不再重复解析
+                meituan_df = self.load_meituan(meituan_uploaded.getvalue())
                 
                 if meituan_df is None:
                     st.error("无法识别美团文件格式，请检查文件是否正确")
                     return
-                
-                self.meituan_file = meituan_df
-                
-                # 清理数据：移除完全空的列和行
-                self.meituan_file = self.meituan_file.dropna(how='all', axis=1)  # 删除全空列
-                self.meituan_file = self.meituan_file.dropna(how='all', axis=0)  # 删除全空行
-                
-                # 转换所有列为字符串类型以避免类型冲突
-                for col in self.meituan_file.columns:
-                    if self.meituan_file[col].dtype == 'object':
-                        self.meituan_file[col] = self.meituan_file[col].astype(str)
                     
                 # 智能检测列名
                 date_col = None
@@ -334,8 +139,8 @@ class ReservationMatcherWeb:
                     """, unsafe_allow_html=True)
                     
                     with st.expander("👀 预览美团数据", expanded=False):
-                        # 创建显示用的DataFrame副本
-                        display_df = self.meituan_file.copy()
+                        # 预览只读，直接显示共享的数据，不复制
+                        display_df = self.meituan_file
                         
                         # 现代化表格样式
                         st.markdown("""
@@ -425,45 +230,17 @@ class ReservationMatcherWeb:
             
             if reservation_uploaded:
                 try:
-                    # 读取Excel文件的所有工作表
-                    excel_file = pd.ExcelFile(reservation_uploaded)
-                    all_sheets_data = []
-                    
-                    # 简化显示信息
-                    valid_sheets = 0
-                    total_records = 0
+                    # 解析结果按文件内容哈希在各会话间共享，页面重新运行时不再重复解析
+                    reservation_df, valid_sheets, failed_sheets = self.load_reservation(reservation_uploaded.getvalue())
                     
-                    # 逐个读取每个工作表
-                    for sheet_name in excel_file.sheet_names:
-                        try:
-                            sheet_df = pd.read_excel(reservation_uploaded, sheet_name=sheet_name)
-                            
-                            # 处理新格式的预定表（检测是否为新格式）
-                            sheet_df = self.process_new_format_reservation(sheet_df)
-                            
-                            # 清理数据：移除完全空的列和行
-                            sheet_df = sheet_df.dropna(how='all', axis=1)  # 删除全空列
-                            sheet_df = sheet_df.dropna(how='all', axis=0)  # 删除全空行
-                            
-                            # 如果工作表有数据，添加到列表中
-                            if not sheet_df.empty:
-                                # 添加工作表名称列用于标识数据来源
-                                sheet_df['数据来源工作表'] = sheet_name
-                                all_sheets_data.append(sheet_df)
-                                valid_sheets += 1
-                                total_records += len(sheet_df)
-                        except Exception as e:
-                            continue  # 静默跳过错误的工作表
+                    # 提示处理失败的工作表
+                    if failed_sheets:
+                        st.warning(
+                            f"⚠️ {len(failed_sheets)} 个工作表处理失败，已跳过：" +
+                            "；".join(f"{sheet_name}（{error}）" for sheet_name, error in failed_sheets)
+                        )
                     
-                    # 合并所有工作表的数据
-                    if all_sheets_data:
-                        self.reservation_file = pd.concat(all_sheets_data, ignore_index=True)
-                        
-                        # 转换所有列为字符串类型以避免类型冲突
-                        for col in self.reservation_file.columns:
-                            if self.reservation_file[col].dtype == 'object':
-                                self.reservation_file[col] = self.reservation_file[col].astype(str)
-                        
+                    if not reservation_df.empty:
                         # 现代化成功提示
                         st.markdown(f"""
                         <div style='background: linear-gradient(135deg, rgba(139, 92, 246, 0.1), rgba(124, 58, 237, 0.1)); 
@@ -485,8 +262,8 @@ class ReservationMatcherWeb:
                         self.reservation_file = pd.DataFrame()
                     
                     with st.expander("👀 预览预订数据", expanded=False):
-                        # 创建显示用的DataFrame副本
-                        display_df = self.reservation_file.copy()
+                        # 预览只读，直接显示共享的数据，不复制
+                        display_df = self.reservation_file
                         
                         # 现代化表格样式（预订数据用紫色主题）
                         st.markdown("""
@@ -546,326 +323,6 @@ class ReservationMatcherWeb:
             
 
     
-    def validate_files(self):
-        """验证文件是否已加载"""
-        if self.meituan_file is None or self.reservation_file is None:
-            return False, "请先上传美团订单文件和预订记录文件"
-        
-        if self.meituan_file.empty or self.reservation_file.empty:
-            return False, "上传的文件为空，请检查文件内容"
-        
-        return True, "文件验证通过"
-    
-    def match_data(self):
-        """数据匹配核心逻辑 - 使用与桌面版完全相同的匹配算法"""
-        try:
-            # 读取美团数据 - 使用与桌面版相同的处理方式
-            df = self.meituan_file.copy()
-            
-            # 数据清洗和预处理
-            df = df[df['订单状态'] == '已结账']
-            df = df[df['营业日期'] != '--']
-            
-            # 改进的支付金额提取
-            def extract_payment(payment_str):
-                if pd.isna(payment_str):
-                    return None
-                try:
-                    # 查找所有数字（包括负数和小数）
-                    numbers = re.findall(r'-?\d+\.?\d*', str(payment_str))
-                    if numbers:
-                        return float(numbers[0])
-                except (ValueError, IndexError):
-                    pass
-                return None
-                
-            df['支付合计'] = df['结账方式'].apply(extract_payment)
-            df['营业日期'] = pd.to_datetime(df['营业日期'], errors='coerce')
-            df['下单时间'] = pd.to_datetime(df['下单时间'], errors='coerce')
-            
-            # 根据下单时间判断市别
-            def determine_market_period(order_time):
-                if pd.isna(order_time):
-                    return None
-                try:
-                    hour = pd.to_datetime(order_time).hour
-                    # 午市: 6:00-16:00, 晚市: 16:00-24:00
-                    if 6 <= hour < 16:
-                        return '午市'
-                    elif 16 <= hour <= 23:
-                        return '晚市'
-                    else:
-                        return None  # 非营业时间
-                except:
-                    return None
-            
-            df['市别'] = df['下单时间'].apply(determine_market_period)
-            
-            # 选择需要的列，保留下单时间和结账方式用于显示
-            mt_df = df[['营业日期', '桌牌号', '下单时间', '支付合计', '市别', '结账方式']].copy()
-            # 过滤掉非营业时间的订单
-            mt_df = mt_df[mt_df['市别'].notna()]
-            
-            # 格式化下单时间为更易读的格式
-            try:
-                mt_df['下单时间_格式化'] = mt_df['下单时间'].dt.strftime('%H:%M:%S')
-            except AttributeError:
-                # 如果不是datetime类型，尝试转换后格式化
-                mt_df['下单时间'] = pd.to_datetime(mt_df['下单时间'], errors='coerce')
-                mt_df['下单时间_格式化'] = mt_df['下单时间'].dt.strftime('%H:%M:%S')
-            
-            # 提取下单时间的日期部分用于匹配
-            mt_df['下单日期'] = mt_df['下单时间'].dt.date
-            
-            # 读取预订数据
-            merged_all = pd.DataFrame()
-            
-            # 处理预订数据 - 支持多工作表
-            if hasattr(self.reservation_file, 'sheet_names'):
-                # 如果是ExcelFile对象，处理多个工作表
-                for sheet_name in self.reservation_file.sheet_names:
-                    try:
-                        day_df = pd.read_excel(self.reservation_file, sheet_name=sheet_name)
-                        
-                        # 检查必要的列是否存在（兼容新旧格式）
-                        # 新格式：姓名、预订人
-                        # 旧格式：姓名、预订人 或 客户姓名、预订人
-                        has_name_col = '姓名' in day_df.columns or '客户姓名' in day_df.columns
-                        has_booker_col = '预订人' in day_df.columns
-                        
-                        if not (has_name_col and has_booker_col):
-                            continue
-                            
-                        # 数据清洗（兼容新旧格式）
-                        name_col = '姓名' if '姓名' in day_df.columns else '客户姓名'
-                        day_df = day_df[day_df[name_col].notna() & day_df['预订人'].notna()]
-                        
-                        # 预订人姓名标准化处理
-                        def standardize_name(name):
-                            if pd.isna(name):
-                                return name
-                            name_str = str(name).strip()
-                            # 处理同义词
-                            if name_str in ['平和', '平哥']:
-                                return '平和'
-                            # 处理刘霞和刘的映射
-                            if name_str in ['刘霞', '刘']:
-                                return '刘霞'
-                            # 处理周和周思玗的映射
-                            if name_str in ['周', '周思玗']:
-                                return '周思玗'
-                            # 处理大小写统一（sk -> SK）
-                            if name_str.lower() == 'sk':
-                                return 'SK'
-                            return name_str
-                        
-                        day_df['预订人'] = day_df['预订人'].apply(standardize_name)
-                        
-                        # 选择和重命名列（兼容新旧格式）
-                        # 新格式可能的列：日期、市别、包厢、姓名、预订人、人数、时间、客户类型
-                        # 旧格式可能的列：日期、市别、包厢、客户姓名、预订人、经手人
-                        available_cols = ['日期', '市别', '包厢', '姓名', '客户姓名', '预订人', '经手人', '人数', '时间', '客户类型']
-                        existing_cols = [col for col in available_cols if col in day_df.columns]
-                        day_df = day_df[existing_cols].copy()
-                        
-                        # 标准化列名（统一为旧格式的列名以保持兼容性）
-                        col_mapping = {
-                            '包厢': '桌牌号', 
-                            '姓名': '客户姓名',  # 新格式的姓名映射为客户姓名
-                            '客户姓名': '客户姓名'  # 旧格式保持不变
-                        }
-                        day_df.rename(columns=col_mapping, inplace=True)
-                        
-                        # 处理日期
-                        if '日期' in day_df.columns:
-                            day_df['日期'] = pd.to_datetime(
-                                day_df['日期'].astype(str).str.split().str[0], 
-                                errors='coerce'
-                            )
-                        
-                        # 合并数据 - 改进的匹配逻辑
-                        if '日期' in day_df.columns and '桌牌号' in day_df.columns and '市别' in day_df.columns:
-                            # 为每个预订记录找到最佳匹配的美团订单
-                            merged_records = []
-                            
-                            for _, reservation in day_df.iterrows():
-                                # 找到同一日期、市别的所有美团订单，然后使用智能桌牌号匹配
-                                reservation_date = reservation['日期'].date() if hasattr(reservation['日期'], 'date') else reservation['日期']
-                                
-                                # 先按日期和市别筛选
-                                candidate_orders = mt_df[
-                                    (mt_df['下单日期'] == reservation_date) &
-                                    (mt_df['市别'] == reservation['市别'])
-                                ].copy()
-                                
-                                # 使用智能匹配找到桌牌号匹配的订单
-                                matching_orders = []
-                                match_info = []
-                                
-                                for _, order in candidate_orders.iterrows():
-                                    is_match, match_type = self.smart_table_match(
-                                        reservation['桌牌号'], 
-                                        order['桌牌号']
-                                    )
-                                    if is_match:
-                                        matching_orders.append(order)
-                                        match_info.append(match_type)
-                                
-                                matching_orders = pd.DataFrame(matching_orders) if matching_orders else pd.DataFrame()
-                                
-                                if not matching_orders.empty:
-                                    # 为每个匹配的订单创建独立记录
-                                    for idx, (_, order) in enumerate(matching_orders.iterrows()):
-                                        merged_record = reservation.copy()
-                                        merged_record['支付合计'] = order['支付合计']
-                                        merged_record['下单时间'] = order['下单时间']
-                                        merged_record['下单时间_格式化'] = order['下单时间_格式化']
-                                        merged_record['结账方式'] = order['结账方式']
-                                        merged_record['匹配类型'] = match_info[idx] if idx < len(match_info) else '未知'
-                                        merged_records.append(merged_record)
-                                else:
-                                    # 没有匹配的订单
-                                    merged_record = reservation.copy()
-                                    merged_record['支付合计'] = None
-                                    merged_record['下单时间'] = None
-                                    merged_record['下单时间_格式化'] = None
-                                    merged_record['结账方式'] = None
-                                    merged_record['匹配类型'] = '未匹配'
-                                    merged_records.append(merged_record)
-                            
-                            if merged_records:
-                                merged = pd.DataFrame(merged_records)
-                                merged_all = pd.concat([merged_all, merged], ignore_index=True)
-                                
-                    except Exception as e:
-                        continue
-            else:
-                # 如果是单个DataFrame，直接处理
-                day_df = self.reservation_file.copy()
-                
-                # 检查必要的列是否存在 - 兼容新旧格式
-                name_col = None
-                if '姓名' in day_df.columns:
-                    name_col = '姓名'
-                elif '客户姓名' in day_df.columns:
-                    name_col = '客户姓名'
-                
-                if name_col is None or '预订人' not in day_df.columns:
-                    return False, f"预订文件缺少必要列: 需要'姓名'或'客户姓名'列以及'预订人'列"
-                    
-                # 数据清洗
-                day_df = day_df[day_df[name_col].notna() & day_df['预订人'].notna()]
-                
-                # 选择和重命名列 - 兼容新旧格式
-                available_cols = ['日期', '市别', '包厢', '桌牌号', name_col, '预订人', '经手人', '预订时间']
-                existing_cols = [col for col in available_cols if col in day_df.columns]
-                day_df = day_df[existing_cols].copy()
-                
-                # 标准化列名 - 统一映射到旧格式列名
-                col_mapping = {
-                    '包厢': '桌牌号',
-                    '姓名': '客户姓名'  # 新格式的'姓名'映射为'客户姓名'
-                }
-                # 如果已经是'客户姓名'列，则不需要重命名
-                if name_col == '客户姓名':
-                    col_mapping.pop('姓名', None)
-                    
-                day_df.rename(columns=col_mapping, inplace=True)
-                
-                # 处理日期
-                if '日期' in day_df.columns:
-                    day_df['日期'] = pd.to_datetime(
-                        day_df['日期'].astype(str).str.split().str[0], 
-                        errors='coerce'
-                    )
-                
-                # 合并数据 - 改进的匹配逻辑
-                if '日期' in day_df.columns and '桌牌号' in day_df.columns and '市别' in day_df.columns:
-                    # 为每个预订记录找到最佳匹配的美团订单
-                    merged_records = []
-                    
-                    for _, reservation in day_df.iterrows():
-                        # 找到同一日期、市别的所有美团订单，然后使用智能桌牌号匹配
-                        reservation_date = reservation['日期'].date() if hasattr(reservation['日期'], 'date') else reservation['日期']
-                        
-                        # 先按日期和市别筛选
-                        candidate_orders = mt_df[
-                            (mt_df['下单日期'] == reservation_date) &
-                            (mt_df['市别'] == reservation['市别'])
-                        ].copy()
-                        
-                        # 使用智能匹配找到桌牌号匹配的订单
-                        matching_orders = []
-                        match_info = []
-                        
-                        for _, order in candidate_orders.iterrows():
-                            is_match, match_type = self.smart_table_match(
-                                reservation['桌牌号'], 
-                                order['桌牌号']
-                            )
-                            if is_match:
-                                matching_orders.append(order)
-                                match_info.append(match_type)
-                        
-                        matching_orders = pd.DataFrame(matching_orders) if matching_orders else pd.DataFrame()
-                        
-                        if not matching_orders.empty:
-                            # 为每个匹配的订单创建独立记录
-                            for idx, (_, order) in enumerate(matching_orders.iterrows()):
-                                merged_record = reservation.copy()
-                                merged_record['支付合计'] = order['支付合计']
-                                merged_record['下单时间'] = order['下单时间']
-                                merged_record['下单时间_格式化'] = order['下单时间_格式化']
-                                merged_record['结账方式'] = order['结账方式']
-                                merged_record['匹配类型'] = match_info[idx] if idx < len(match_info) else '未知'
-                                merged_records.append(merged_record)
-                        else:
-                            # 没有匹配的订单
-                            merged_record = reservation.copy()
-                            merged_record['支付合计'] = None
-                            merged_record['下单时间'] = None
-                            merged_record['下单时间_格式化'] = None
-                            merged_record['结账方式'] = None
-                            merged_record['匹配类型'] = '未匹配'
-                            merged_records.append(merged_record)
-                    
-                    if merged_records:
-                        merged_all = pd.DataFrame(merged_records)
-            
-            # 数据后处理
-            if not merged_all.empty:
-                # 添加匹配状态列
-                merged_all['匹配状态'] = merged_all['支付合计'].apply(
-                    lambda x: '已匹配' if pd.notna(x) else '未匹配'
-                )
-                
-                # 格式化数据
-                if '支付合计' in merged_all.columns:
-                    merged_all['支付合计'] = merged_all['支付合计'].apply(
-                        lambda x: f"{x:.2f}" if pd.notna(x) else ""
-                    )
-                    
-                # 排序
-                sort_cols = []
-                if '日期' in merged_all.columns:
-                    sort_cols.append('日期')
-                if '桌牌号' in merged_all.columns:
-                    sort_cols.append('桌牌号')
-                if sort_cols:
-                    merged_all.sort_values(sort_cols, inplace=True, ignore_index=True)
-            
-            self.merged_df = merged_all
-            self.original_df = merged_all.copy()  # 保存原始数据
-            
-            # 显示统计信息
-            total_records = len(self.merged_df)
-            matched_records = len(self.merged_df[self.merged_df['匹配状态'] == '已匹配']) if '匹配状态' in self.merged_df.columns else 0
-            
-            return True, f"匹配完成！总记录: {total_records}, 已匹配: {matched_records}, 未匹配: {total_records - matched_records}"
-            
-        except Exception as e:
-            return False, f"匹配失败: {str(e)}"
-    
     def display_results(self):
         """显示匹配结果"""
         if self.merged_df.empty:
@@ -1033,7 +490,7 @@ class ReservationMatcherWeb:
             st.markdown("**📊 显示范围**")
             filter_option = st.selectbox(
                 "选择要显示的数据类型",
-                ["全部记录", "已匹配记录", "未匹配记录"],
+                matcher_core.FILTER_OPTIONS,
                 help="选择要查看的数据范围"
             )
             # 保存筛选条件到session_state
@@ -1050,35 +507,7 @@ class ReservationMatcherWeb:
             st.session_state.search_keyword = search_keyword
         
         # 应用筛选
-        display_df = self.merged_df.copy()
-        
-        if filter_option == "已匹配记录":
-            display_df = display_df[display_df['匹配状态'] == '已匹配']
-        elif filter_option == "未匹配记录":
-            display_df = display_df[display_df['匹配状态'] == '未匹配']
-        
-        if search_keyword:
-            if '预订人' in display_df.columns:
-                # 标准化搜索关键词
-                def standardize_search_keyword(keyword):
-                    keyword = keyword.strip()
-                    if keyword in ['平和', '平哥']:
-                        return ['平和', '平哥']  # 返回所有同义词
-                    elif keyword in ['刘霞', '刘']:
-                        return ['刘霞', '刘']  # 返回刘霞和刘的所有变体
-                    elif keyword in ['周', '周思玗']:
-                        return ['周', '周思玗']  # 返回周和周思玗的所有变体
-                    elif keyword.lower() == 'sk':
-                        return ['SK', 'sk', 'Sk', 'sK']  # 返回所有大小写变体
-                    else:
-                        return [keyword]
-                
-                search_terms = standardize_search_keyword(search_keyword)
-                # 创建搜索条件，匹配任何一个同义词
-                search_condition = False
-                for term in search_terms:
-                    search_condition |= display_df['预订人'].astype(str).str.contains(term, case=False, na=False)
-                display_df = display_df[search_condition]
+        display_df = self.filter_results(filter_option, search_keyword)
         
         # 现代化数据表格展示
         st.markdown(f"""
@@ -1106,8 +535,8 @@ class ReservationMatcherWeb:
             columns_to_show = ['日期', '桌牌号', '预订人', '市别', '匹配状态', '匹配类型']
             available_columns = [col for col in columns_to_show if col in display_df.columns]
             
-            # 创建显示用的DataFrame副本并处理数据类型
-            table_df = display_df[available_columns].copy()
+            # 显示用的浅拷贝：下面整列替换为格式化文本，不影响匹配结果
+            table_df = display_df[available_columns].copy(deep=False)
             
             # 格式化显示
             for col in table_df.columns:
@@ -1121,6 +550,7 @@ class ReservationMatcherWeb:
                         '数字匹配': '🔢数字匹配',
                         '外卖匹配': '🚚外卖匹配',
                         '包厢外卖匹配': '🏠🚚包厢外卖',
+                        '手动匹配': '✋手动匹配',
                         '未匹配': '❌未匹配'
                     }
                     table_df[col] = table_df[col].apply(lambda x: type_icons.get(str(x), str(x)) if pd.notna(x) else '')
@@ -1235,30 +665,8 @@ class ReservationMatcherWeb:
             if hasattr(reservation_date, 'date'):
                 reservation_date = reservation_date.date()
             
-            # 处理美团数据，确保支付合计字段正确提取
-            def extract_payment(payment_str):
-                if pd.isna(payment_str):
-                    return None
-                try:
-                    # 查找所有数字（包括负数和小数）
-                    numbers = re.findall(r'-?\d+\.?\d*', str(payment_str))
-                    if numbers:
-                        return float(numbers[0])
-                except (ValueError, IndexError):
-                    pass
-                return None
-            
-            # 复制美团文件并处理支付合计
-            meituan_processed = self.meituan_file.copy()
-            
-            # 应用与自动匹配相同的数据过滤条件
-            if '订单状态' in meituan_processed.columns:
-                meituan_processed = meituan_processed[meituan_processed['订单状态'] == '已结账']
-            if '营业日期' in meituan_processed.columns:
-                meituan_processed = meituan_processed[meituan_processed['营业日期'] != '--']
-            
-            if '支付合计' not in meituan_processed.columns and '结账方式' in meituan_processed.columns:
-                meituan_processed['支付合计'] = meituan_processed['结账方式'].apply(extract_payment)
+            # 应用与自动匹配相同的预处理（筛选已结账订单并提取支付合计）
+            meituan_processed = match_engine.settled_orders(self.meituan_file)
             
             # 安全地比较日期（使用下单时间的日期进行匹配）
             try:
@@ -1294,8 +702,8 @@ class ReservationMatcherWeb:
                         st.write(f"- {status}: {count} 个")
                 
                 if '营业日期' in self.meituan_file.columns:
-                    dash_count = (self.meituan_file['营业日期'] == '--').sum()
-                    st.write(f"**营业日期为'--'的记录数:** {dash_count}")
+                    dash_count = self.meituan_file['营业日期'].isna().sum()
+                    st.write(f"**营业日期无效（如'--'）的记录数:** {dash_count}")
                 
                 # 显示原始数据的日期范围
                 if '下单时间' in self.meituan_file.columns:
@@ -1364,7 +772,7 @@ class ReservationMatcherWeb:
                 available_columns = [col for col in display_columns if col in related_meituan.columns]
                 
                 if available_columns:
-                    meituan_display = related_meituan[available_columns].copy()
+                    meituan_display = related_meituan[available_columns].copy(deep=False)
                     # 格式化显示
                     for col in meituan_display.columns:
                         if col == '支付合计':
@@ -1413,34 +821,7 @@ class ReservationMatcherWeb:
             # 确认匹配按钮
             if st.button("确认匹配", type="primary"):
                 if selected_meituan_indices:
-                    # 获取原始预订记录
-                    original_reservation = self.merged_df.loc[reservation_idx].copy()
-                    
-                    # 为每个选中的美团订单创建匹配记录
-                    new_records = []
-                    for i, meituan_idx in enumerate(selected_meituan_indices):
-                        meituan_record = related_meituan.loc[meituan_idx]
-                        
-                        # 创建新的匹配记录
-                        new_record = original_reservation.copy()
-                        new_record['匹配状态'] = '已匹配'
-                        new_record['下单时间'] = str(meituan_record.get('下单时间', ''))
-                        new_record['下单时间_格式化'] = str(meituan_record.get('下单时间', ''))
-                        new_record['结账方式'] = str(meituan_record.get('结账方式', ''))
-                        
-                        # 如果是第一个记录，更新原记录；否则添加新记录
-                        if i == 0:
-                            # 更新原记录
-                            for col in new_record.index:
-                                self.merged_df.at[reservation_idx, col] = new_record[col]
-                        else:
-                            # 添加新记录到列表
-                            new_records.append(new_record)
-                    
-                    # 将新记录添加到DataFrame
-                    if new_records:
-                        new_df = pd.DataFrame(new_records)
-                        self.merged_df = pd.concat([self.merged_df, new_df], ignore_index=True)
+                    self.add_manual_matches(reservation_idx, related_meituan.loc[selected_meituan_indices])
                     
                     st.success(f"匹配成功！已为 {len(selected_meituan_indices)} 个美团订单创建匹配记录。页面将自动刷新")
                     st.rerun()
@@ -1456,8 +837,14 @@ class ReservationMatcherWeb:
         # 导出选项
         export_option = st.selectbox(
             "导出选项",
-            ["仅搜索", "全部（按时间排列）"]
+            matcher_core.EXPORT_OPTIONS
         )
+        format_label = st.selectbox(
+            "文件格式",
+            list(matcher_core.FILE_FORMAT_OPTIONS),
+            help="CSV、Parquet、JSON Lines 供下游脚本读取：支付合计为数值，下单时间为日期时间"
+        )
+        file_format = matcher_core.FILE_FORMAT_OPTIONS[format_label]
         
         # 获取当前搜索和筛选条件
         if 'filter_option' not in st.session_state:
@@ -1465,212 +852,67 @@ class ReservationMatcherWeb:
         if 'search_keyword' not in st.session_state:
             st.session_state.search_keyword = ""
         
-        # 准备导出数据
-        if export_option == "仅搜索":
-            # 获取当前显示的搜索结果（只包含匹配成功的）
-            export_df = self.get_filtered_data()
-            export_df = export_df[export_df['匹配状态'] == '已匹配']  # 只导出匹配成功的
-            
-            # 根据搜索关键词生成文件名
-            search_keyword = getattr(st.session_state, 'search_keyword', "")
-            if search_keyword.strip():
-                filename_suffix = f"{search_keyword.strip()}（美团匹配清单）"
-            else:
-                filename_suffix = "搜索结果"
-        else:
-            # 全部匹配成功的数据，按时间排列
-            export_df = self.merged_df[self.merged_df['匹配状态'] == '已匹配'].copy()
-            if '日期' in export_df.columns:
-                export_df = export_df.sort_values('日期')
-            filename_suffix = "全部匹配"
-        
-        if export_df.empty:
+        export_args = (export_option, st.session_state.filter_option, st.session_state.search_keyword, file_format)
+        # 文件只在点击生成时创建，结果和导出条件不变时重新运行页面直接使用已生成的文件
+        generated, exported = self.cached_export(*export_args)
+        if not generated:
+            if not st.button(f"📦 生成{file_format.upper()}文件", use_container_width=True):
+                return
+            with st.spinner("正在生成导出文件..."):
+                exported = self.export_file(*export_args)
+        if exported is None:
             st.warning("没有匹配成功的数据可导出")
             return
         
-        # 准备导出的列
-        export_columns = ['下单时间', '预订人', '桌牌号', '支付合计', '结账方式', '匹配类型']
-        
-        # 检查并选择可用的列
-        available_columns = []
-        for col in export_columns:
-            if col in export_df.columns:
-                available_columns.append(col)
-            elif col == '预订人' and '客户姓名' in export_df.columns:
-                available_columns.append('客户姓名')
-                export_df = export_df.rename(columns={'客户姓名': '预订人'})
-        
-        # 创建导出用的DataFrame
-        final_export_df = export_df[available_columns].copy()
-        
-        # 按日期排序（如果有下单时间列）
-        if '下单时间' in final_export_df.columns:
-            final_export_df = final_export_df.sort_values('下单时间')
-        
-        # 创建Excel文件
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            final_export_df.to_excel(writer, sheet_name='匹配结果', index=False)
-            
-            # 获取工作表并设置格式
-            worksheet = writer.sheets['匹配结果']
-            
-            # 设置Excel格式
-            from openpyxl.styles import Alignment, Font, PatternFill, Border, Side
-            
-            # 定义样式
-            header_font = Font(bold=True, size=12)
-            header_fill = PatternFill(start_color="E6F3FF", end_color="E6F3FF", fill_type="solid")
-            center_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-            border = Border(
-                left=Side(style='thin'),
-                right=Side(style='thin'),
-                top=Side(style='thin'),
-                bottom=Side(style='thin')
+        # 文件已写在磁盘上，下载按钮直接读取文件，不在会话中另外保存一份内容
+        export_path, filename, record_count = exported
+        with open(export_path, 'rb') as export_file:
+            st.download_button(
+                label=f"📥 下载{file_format.upper()} ({record_count}条记录)",
+                data=export_file,
+                file_name=filename,
+                mime=exporter.FILE_FORMATS[file_format],
+                use_container_width=True
             )
-            
-            # 设置表头样式
-            for cell in worksheet[1]:
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = center_alignment
-                cell.border = border
-            
-            # 设置数据行样式
-            for row in worksheet.iter_rows(min_row=2):
-                for cell in row:
-                    cell.alignment = center_alignment
-                    cell.border = border
-            
-            # 智能调整列宽
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                
-                # 计算列的最大内容长度
-                for cell in column:
-                    try:
-                        cell_value = str(cell.value) if cell.value is not None else ""
-                        # 中文字符按2个字符计算宽度
-                        char_count = sum(2 if ord(char) > 127 else 1 for char in cell_value)
-                        if char_count > max_length:
-                            max_length = char_count
-                    except:
-                        pass
-                
-                # 根据列内容设置合适的宽度
-                if column_letter == 'A':  # 下单时间列
-                    adjusted_width = max(22, min(max_length + 4, 28))
-                elif column_letter == 'B':  # 预订人列
-                    adjusted_width = max(15, min(max_length + 3, 25))
-                elif column_letter == 'C':  # 桌牌号列
-                    adjusted_width = max(12, min(max_length + 3, 18))
-                elif column_letter == 'D':  # 支付合计列
-                    adjusted_width = max(15, min(max_length + 3, 22))
-                elif column_letter == 'E':  # 结账方式列
-                    adjusted_width = max(25, min(max_length + 5, 40))  # 增加结账方式列宽度
-                elif column_letter == 'F':  # 匹配类型列
-                    adjusted_width = max(12, min(max_length + 3, 18))
-                else:
-                    adjusted_width = max(15, min(max_length + 3, 35))
-                
-                worksheet.column_dimensions[column_letter].width = adjusted_width
-            
-            # 设置行高
-            for row in range(1, worksheet.max_row + 1):
-                worksheet.row_dimensions[row].height = 35  # 增加行高以适应多行内容
-            
-            # 特别处理表头行高
-            worksheet.row_dimensions[1].height = 30
-        
-        excel_data = output.getvalue()
-        
-        # 生成文件名
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"匹配结果_{filename_suffix}_{timestamp}.xlsx"
-        
-        st.download_button(
-            label=f"📥 下载Excel ({len(final_export_df)}条记录)",
-            data=excel_data,
-            file_name=filename,
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            use_container_width=True
+    
+    def export_all_customers(self):
+        """批量导出所有预订人的明细，打包为一个zip文件"""
+        st.divider()
+        st.markdown("**📦 批量导出全部预订人**")
+        layout = st.radio(
+            "文件组织方式",
+            ["每个预订人一个Excel", "一个Excel，每个预订人一个工作表"],
+            key="customer_archive_layout"
         )
+        single_workbook = layout != "每个预订人一个Excel"
+        
+        # 只在点击时生成，匹配结果未修改时重新运行页面直接使用已生成的压缩包
+        generated, exported = self.cached_customer_archive(single_workbook)
+        if not generated:
+            if not st.button("📦 生成全部预订人明细", use_container_width=True):
+                return
+            with st.spinner("正在生成全部预订人明细..."):
+                exported = self.export_customer_archive(single_workbook)
+        if exported is None:
+            st.warning("没有可导出的预订人数据")
+            return
+        
+        archive_path, filename, customer_count = exported
+        with open(archive_path, 'rb') as archive_file:
+            st.download_button(
+                label=f"📥 下载压缩包（{customer_count}位预订人）",
+                data=archive_file,
+                file_name=filename,
+                mime=exporter.ZIP_MIME,
+                use_container_width=True
+            )
     
     def get_filtered_data(self):
         """获取当前筛选和搜索后的数据"""
-        display_df = self.merged_df.copy()
-        
         # 应用筛选（从session_state获取当前筛选条件）
         filter_option = getattr(st.session_state, 'filter_option', "全部记录")
         search_keyword = getattr(st.session_state, 'search_keyword', "")
-        
-        if filter_option == "已匹配记录":
-            display_df = display_df[display_df['匹配状态'] == '已匹配']
-        elif filter_option == "未匹配记录":
-            display_df = display_df[display_df['匹配状态'] == '未匹配']
-        
-        if search_keyword:
-            if '预订人' in display_df.columns:
-                # 标准化搜索关键词
-                def standardize_search_keyword(keyword):
-                    keyword = keyword.strip()
-                    if keyword in ['平和', '平哥']:
-                        return ['平和', '平哥']  # 返回所有同义词
-                    elif keyword in ['刘霞', '刘']:
-                        return ['刘霞', '刘']  # 返回刘霞和刘的所有变体
-                    elif keyword in ['周', '周思玗']:
-                        return ['周', '周思玗']  # 返回周和周思玗的所有变体
-                    elif keyword.lower() == 'sk':
-                        return ['SK', 'sk', 'Sk', 'sK']  # 返回所有大小写变体
-                    else:
-                        return [keyword]
-                
-                search_terms = standardize_search_keyword(search_keyword)
-                # 创建搜索条件，匹配任何一个同义词
-                search_condition = False
-                for term in search_terms:
-                    search_condition |= display_df['预订人'].astype(str).str.contains(term, case=False, na=False)
-                display_df = display_df[search_condition]
-        
-        return display_df
-    
-    def normalize_customer_name(self, name):
-        """标准化预订人姓名"""
-        if pd.isna(name) or str(name).strip() == '':
-            return None
-        
-        name = str(name).strip()
-        
-        # 转换为小写进行比较
-        name_lower = name.lower()
-        
-        # 定义姓名映射规则
-        name_mappings = {
-            'sk': 'SK',  # sk -> SK
-            '平': '平哥',  # 平 -> 平哥
-            '平哥': '平哥',  # 平哥保持不变
-            '周': '周',  # 周保持不变
-        }
-        
-        # 检查是否需要映射
-        for key, value in name_mappings.items():
-            if name_lower == key.lower():
-                return value
-        
-        # 如果没有特殊映射，返回原始名称（保持原有大小写）
-        return name
-    
-    def get_standardized_customers(self):
-        """获取标准化后的预订人列表"""
-        if '预订人' not in self.merged_df.columns:
-            return []
-        
-        # 标准化所有预订人姓名
-        standardized_names = self.merged_df['预订人'].apply(self.normalize_customer_name)
-        standardized_names = standardized_names.dropna().unique()
-        
-        return sorted([name for name in standardized_names if name])
+        return self.filter_results(filter_option, search_keyword)
     
     def show_data_analysis(self):
         """显示数据分析页面"""
@@ -1718,6 +960,8 @@ class ReservationMatcherWeb:
                     if st.button("📊 开始分析", type="primary", use_container_width=True):
                         st.session_state.analysis_customer = target_customer
                         st.rerun()
+                
+                self.export_all_customers()
             else:
                 st.error("数据中未找到'预订人'字段")
         
@@ -1729,8 +973,7 @@ class ReservationMatcherWeb:
                 customer_name = st.session_state.analysis_customer
                 
                 # 筛选该客户的数据（使用标准化姓名匹配）
-                standardized_customer_names = self.merged_df['预订人'].apply(self.normalize_customer_name)
-                customer_data = self.merged_df[standardized_customer_names == customer_name]
+                customer_data = self.customer_records(customer_name)
                 
                 if customer_data.empty:
                     st.warning(f"未找到预订人'{customer_name}'的相关数据")
@@ -1777,7 +1020,7 @@ class ReservationMatcherWeb:
                         st.markdown("#### 📅 工作日vs周末分析")
                         if '日期' in customer_data.columns:
                             # 只分析已匹配的数据
-                            matched_data = customer_data[customer_data['匹配状态'] == '已匹配'].copy()
+                            matched_data = customer_data[customer_data['匹配状态'] == '已匹配'].copy(deep=False)
                             
                             if not matched_data.empty:
                                 # 转换日期格式并分析工作日/周末
@@ -1867,7 +1110,9 @@ class ReservationMatcherWeb:
                     # 桌牌号偏好分析
                     if '桌牌号' in customer_data.columns:
                         st.markdown("#### 🪑 桌牌号偏好分析")
-                        table_counts = customer_data['桌牌号'].value_counts().head(10)
+                        table_counts = customer_data['桌牌号'].value_counts()
+                        # 桌牌号为分类类型时，未出现的桌牌号计数为0，需要排除
+                        table_counts = table_counts[table_counts > 0].head(10)
                         
                         if not table_counts.empty:
                              fig_bar = px.bar(
@@ -1886,22 +1131,10 @@ class ReservationMatcherWeb:
                     # 详细数据表格
                     st.markdown("#### 📋 详细预订记录")
                     
-                    # 选择要显示的列
-                    display_columns = ['日期', '桌牌号', '匹配状态', '匹配类型']
-                    if '支付合计' in customer_data.columns:
-                        display_columns.append('支付合计')
-                    if '下单时间' in customer_data.columns:
-                        display_columns.append('下单时间')
+                    # 选择要显示的列，按日期倒序
+                    display_data = matcher_core.customer_display_records(customer_data)
                     
-                    available_columns = [col for col in display_columns if col in customer_data.columns]
-                    
-                    if available_columns:
-                        display_data = customer_data[available_columns].copy()
-                        
-                        # 按日期排序
-                        if '日期' in display_data.columns:
-                            display_data = display_data.sort_values('日期', ascending=False)
-                        
+                    if len(display_data.columns):
                         st.dataframe(
                             display_data,
                             use_container_width=True,
@@ -1911,11 +1144,7 @@ class ReservationMatcherWeb:
                         # 导出该客户的数据
                         if st.button(f"📥 导出 {customer_name} 的数据", use_container_width=True):
                             # 创建Excel文件
-                            output = io.BytesIO()
-                            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                                display_data.to_excel(writer, sheet_name=f'{customer_name}_预订记录', index=False)
-                            
-                            excel_data = output.getvalue()
+                            excel_data = exporter.customer_records_excel(display_data, customer_name)
                             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                             filename = f"{customer_name}_预订分析_{timestamp}.xlsx"
                             
@@ -1923,7 +1152,7 @@ class ReservationMatcherWeb:
                                 label=f"下载 {customer_name} 的预订数据",
                                 data=excel_data,
                                 file_name=filename,
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                                mime=exporter.XLSX_MIME
                             )
                     else:
                         st.warning("无可显示的详细数据")
@@ -2525,6 +1754,26 @@ def main():
                 </div>
                 """, unsafe_allow_html=True)
                 
+                # 订单分配方式
+                assignment_label = st.radio(
+                    "订单分配方式",
+                    list(matcher_core.ASSIGNMENT_OPTIONS),
+                    horizontal=True,
+                    help="按时间就近：每条预订只匹配预订时间与下单时间最接近的一个订单，每个订单只分配给一条预订；"
+                         "最优分配：同一订单被多条预订匹配时，按匹配类型和时间差求整体最优的一对一分配"
+                )
+                assignment = matcher_core.ASSIGNMENT_OPTIONS[assignment_label]
+                tolerance_minutes = int(match_engine.DEFAULT_TIME_TOLERANCE / pd.Timedelta(minutes=1))
+                if assignment in (match_engine.ASSIGN_NEAREST, match_engine.ASSIGN_OPTIMAL):
+                    tolerance_minutes = st.number_input(
+                        "时间容差（分钟）",
+                        min_value=5,
+                        max_value=720,
+                        value=tolerance_minutes,
+                        step=5,
+                        help="按时间就近分配时，预订时间与下单时间相差超过该值不分配；最优分配时超过该值不再因时间接近加分"
+                    )
+                
                 if st.button("🚀 开始智能匹配", type="primary", use_container_width=True):
                     # 现代化进度指示器
                     progress_container = st.container()
@@ -2545,30 +1794,22 @@ def main():
                         progress_bar = st.progress(0)
                         status_text = st.empty()
                         
-                        # 模拟匹配过程的进度更新
-                        import time
-                        
-                        status_text.text("📊 正在分析美团数据...")
-                        progress_bar.progress(20)
-                        time.sleep(0.5)
-                        
-                        status_text.text("📋 正在处理预订记录...")
-                        progress_bar.progress(40)
-                        time.sleep(0.5)
+                        # 进度条跟随 match_data 实际处理的阶段，只在百分比变化时刷新
+                        last_percent = [-1]
                         
-                        status_text.text("🔍 正在执行智能匹配算法...")
-                        progress_bar.progress(70)
-                        time.sleep(0.5)
-                        
-                        status_text.text("✨ 正在生成匹配结果...")
-                        progress_bar.progress(90)
+                        def update_progress(fraction, message):
+                            percent = int(fraction * 100)
+                            if percent != last_percent[0]:
+                                last_percent[0] = percent
+                                progress_bar.progress(percent)
+                                status_text.text(message)
                         
                         # 执行实际匹配
-                        success, result_message = app.match_data()
-                        
-                        progress_bar.progress(100)
-                        status_text.text("🎉 匹配完成！")
-                        time.sleep(0.5)
+                        success, result_message = app.match_data(
+                            progress_callback=update_progress,
+                            assignment=assignment,
+                            tolerance=pd.Timedelta(minutes=tolerance_minutes)
+                        )
                         
                         # 清除进度指示器
                         progress_container.empty()
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+匹配引擎回归检查，可用 pytest 运行，也可直接 python test_match_engine.py
+"""
+
+import pandas as pd
+
+import match_engine
+
+
+def _side(position_col, times):
+    """同一 (日期, 市别, 桌牌键) 下的预订或订单"""
+    return pd.DataFrame({
+        position_col: range(len(times)),
+        '_date': pd.Timestamp('2024-08-01'),
+        '_market': '午市',
+        '_key': 8,
+        '_time': pd.to_datetime(times),
+    })
+
+
+def test_nearest_equal_time_orders_before_booking():
+    """预订之前有两条同一时间的订单时分配订单位置靠前的"""
+    reservations = _side('_res_pos', ['2024-08-01 12:00'])
+    orders = _side('_mt_pos', ['2024-08-01 11:50', '2024-08-01 11:50'])
+    res_pos, mt_pos = match_engine._assign_nearest(reservations, orders, pd.Timedelta(hours=3))
+    assert res_pos.tolist() == [0]
+    assert mt_pos.tolist() == [0]
+
+
+def test_nearest_equal_time_orders_contended():
+    """两条预订争抢同一时间的两条订单时按预订顺序依次分配"""
+    reservations = _side('_res_pos', ['2024-08-01 12:00', '2024-08-01 12:00'])
+    orders = _side('_mt_pos', ['2024-08-01 11:50', '2024-08-01 11:50'])
+    res_pos, mt_pos = match_engine._assign_nearest(reservations, orders, pd.Timedelta(hours=3))
+    assert sorted(zip(res_pos.tolist(), mt_pos.tolist())) == [(0, 0), (1, 1)]
+
+
+if __name__ == '__main__':
+    test_nearest_equal_time_orders_before_booking()
+    test_nearest_equal_time_orders_contended()
+    print('OK')
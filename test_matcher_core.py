@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+匹配核心回归检查，可用 pytest 运行，也可直接 python test_matcher_core.py
+"""
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+import matcher_core
+
+
+def _orders():
+    times = pd.to_datetime(['2025-08-01 12:05', '2025-08-01 18:10', '2025-08-02 12:20'])
+    return pd.DataFrame({
+        '营业日期': times.strftime('%Y-%m-%d'),
+        '下单时间': times.strftime('%Y-%m-%d %H:%M:%S'),
+        '桌牌号': ['8号', '8号', '8号'],
+        '市别': ['午市', '晚市', '午市'],
+        '结账方式': ['美团支付100', '美团支付200', '美团支付300'],
+    })
+
+
+def _reservations(dinner_booker):
+    # 同一天同一桌的晚市预订排在午市之前，排序时与午市相同的 (日期, 桌牌号) 并列
+    return pd.DataFrame({
+        '日期': ['2025-08-01', '2025-08-01', '2025-08-02'],
+        '市别': ['晚市', '午市', '午市'],
+        '桌牌号': ['8号', '8号', '8号'],
+        '客户姓名': ['张', '李', '王'],
+        '预订人': [dinner_booker, 'SK', '刘'],
+    })
+
+
+def _matched(reservations, previous=None):
+    matcher = previous or matcher_core.ReservationMatcher()
+    matcher.load_meituan(_orders())
+    matcher.load_reservation(reservations)
+    ok, message = matcher.match_data()
+    assert ok, message
+    return matcher, message
+
+
+def test_incremental_match_equals_full_match():
+    """只重新匹配变化的分区时，结果与完整匹配逐行相同（含行顺序和列类型）"""
+    matcher, _ = _matched(_reservations('平哥'))
+    incremental, message = _matched(_reservations('周思玗'), previous=matcher)
+    assert '沿用' in message
+    full, _ = _matched(_reservations('周思玗'))
+    assert_frame_equal(incremental.merged_df, full.merged_df)
+    assert_frame_equal(incremental.original_df, full.original_df)
+
+
+if __name__ == '__main__':
+    test_incremental_match_equals_full_match()
+    print('OK')